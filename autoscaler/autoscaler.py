@@ -25,8 +25,28 @@ print(f"[autoscaler] Runtime detected => {RUNTIME}")
 #  Redis Helpers
 # ============================================================
 
+def _field(d, name):
+    v = d.get(name, d.get(name.encode()))
+    return v.decode() if isinstance(v, bytes) else v
+
+async def get_stream_backlog(r):
+    """Undelivered (lag) + delivered-but-unacked (pending) entries of the worker group."""
+    for g in await r.xinfo_groups(settings.STREAM_KEY):
+        if _field(g, "name") == settings.STREAM_GROUP:
+            lag = _field(g, "lag")
+            if lag is None:
+                # lag is unknown while tombstones exist; acked entries are
+                # XDEL'd, so XLEN is still lag + pending
+                return await r.xlen(settings.STREAM_KEY)
+            return int(lag) + int(_field(g, "pending") or 0)
+    return await r.xlen(settings.STREAM_KEY)
+
 async def get_queue_length(r):
     try:
+        if settings.QUEUE_MODE == "stream":
+            q = await get_stream_backlog(r)
+            print(f"[autoscaler] Checked Redis stream → backlog = {q}")
+            return q
         q = await r.llen(settings.QUEUE_KEY)
         print(f"[autoscaler] Checked Redis → queue length = {q}")
         return q
@@ -135,6 +155,9 @@ async def fly_launch_worker():
                 "DATABASE_URL_SYNC": os.getenv("DATABASE_URL_SYNC"),
                 "REDIS_URL": os.getenv("REDIS_URL"),
                 "QUEUE_KEY": settings.QUEUE_KEY,
+                "QUEUE_MODE": settings.QUEUE_MODE,
+                "STREAM_KEY": settings.STREAM_KEY,
+                "STREAM_GROUP": settings.STREAM_GROUP,
             },
         },
     }
@@ -9,6 +9,10 @@ class Settings(BaseSettings):
     # ---------------------------------------------------------
     REDIS_URL: str = os.getenv("REDIS_URL")
     QUEUE_KEY: str = "mailscout:jobs"
+    # list | reliable | stream (stream: scale on consumer-group lag + pending)
+    QUEUE_MODE: str = os.getenv("QUEUE_MODE", "list")
+    STREAM_KEY: str = os.getenv("STREAM_KEY", "mailscout:jobs:stream")
+    STREAM_GROUP: str = os.getenv("STREAM_GROUP", "mailscout-workers")
 
     # ---------------------------------------------------------
     # Scaling thresholds
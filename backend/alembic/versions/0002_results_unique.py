@@ -0,0 +1,40 @@
+"""unique (upload_id, normalized) on email_results
+
+Revision ID: 0002_results_unique
+Revises: 0001_init
+Create Date: 2025-02-01 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_results_unique"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop duplicates left by requeued chunks, keep the first row
+    op.execute(
+        """
+        DELETE FROM email_results a
+        USING email_results b
+        WHERE a.upload_id = b.upload_id
+          AND a.normalized = b.normalized
+          AND a.id > b.id
+        """
+    )
+
+    # Lets workers insert with ON CONFLICT DO NOTHING instead of
+    # reading back every stored email of the upload to dedupe
+    op.create_index(
+        "uq_email_results_upload_normalized",
+        "email_results",
+        ["upload_id", "normalized"],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("uq_email_results_upload_normalized", table_name="email_results")
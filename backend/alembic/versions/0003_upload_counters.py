@@ -0,0 +1,51 @@
+"""per-status result counters on uploads
+
+Revision ID: 0003_upload_counters
+Revises: 0002_results_unique
+Create Date: 2025-02-15 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_upload_counters"
+down_revision = "0002_results_unique"
+branch_labels = None
+depends_on = None
+
+COUNTERS = ("valid_count", "risky_count", "invalid_count")
+
+
+def upgrade():
+    for name in COUNTERS:
+        op.add_column(
+            "uploads",
+            sa.Column(name, sa.Integer(), nullable=False, server_default="0"),
+        )
+
+    # Backfill from the rows already written; processed_count is reset to
+    # the real row count too, since older workers could over count it
+    op.execute(
+        """
+        UPDATE uploads u
+        SET processed_count = c.processed,
+            valid_count = c.valid,
+            risky_count = c.risky,
+            invalid_count = c.invalid
+        FROM (
+            SELECT upload_id,
+                   count(*) AS processed,
+                   count(*) FILTER (WHERE status = 'valid') AS valid,
+                   count(*) FILTER (WHERE status = 'risky') AS risky,
+                   count(*) FILTER (WHERE status = 'invalid') AS invalid
+            FROM email_results
+            GROUP BY upload_id
+        ) c
+        WHERE u.id = c.upload_id
+        """
+    )
+
+
+def downgrade():
+    for name in reversed(COUNTERS):
+        op.drop_column("uploads", name)
@@ -21,6 +21,18 @@ class Settings(BaseSettings):
     REDIS_URL: str = os.environ.get("REDIS_URL", "redis://redis:6379/0")
 
     QUEUE_KEY: str = "mailscout:jobs"
+    # list: BLPOP (default) | reliable: BLMOVE + heartbeats + reaper
+    # | stream: Redis Streams consumer group (XREADGROUP / XACK / XAUTOCLAIM)
+    QUEUE_MODE: str = os.environ.get("QUEUE_MODE", "list")
+    STREAM_KEY: str = os.environ.get("STREAM_KEY", "mailscout:jobs:stream")
+    STREAM_GROUP: str = os.environ.get("STREAM_GROUP", "mailscout-workers")
+    REDIS_MAX_CONNECTIONS: int = int(os.environ.get("REDIS_MAX_CONNECTIONS", 20))
+    # workers PUBLISH progress snapshots on {PROGRESS_CHANNEL_PREFIX}:{upload_id}
+    PROGRESS_CHANNEL_PREFIX: str = os.environ.get("PROGRESS_CHANNEL_PREFIX", "mailscout:progress")
+    # minimum seconds between two SSE progress events to one watcher
+    PROGRESS_MIN_INTERVAL: float = float(os.environ.get("PROGRESS_MIN_INTERVAL", 0.25))
+    # chunks per multi-value RPUSH when enqueueing an upload
+    ENQUEUE_BATCH_SIZE: int = int(os.environ.get("ENQUEUE_BATCH_SIZE", 50))
 
     # chunking
     CHUNK_SIZE: int = int(os.environ.get("CHUNK_SIZE", 1000))
@@ -34,6 +46,9 @@ class Settings(BaseSettings):
     # File upload limits
     MAX_UPLOAD_SIZE_MB: int = int(os.environ.get("MAX_UPLOAD_SIZE_MB", 256))
 
+    # rows fetched per server-side cursor round trip when exporting results
+    EXPORT_BATCH_SIZE: int = int(os.environ.get("EXPORT_BATCH_SIZE", 5000))
+
     DEBUG: bool = os.environ.get("DEBUG", "False").lower() in ("1", "true", "yes")
 
     class Config:
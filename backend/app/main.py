@@ -3,6 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .config import settings
 from .routers import uploads, results, auth
+from .services.progress import close_progress_hub
+from .services.queue import close_redis
 
 app = FastAPI(title=settings.APP_NAME)
 
@@ -29,6 +31,11 @@ app.add_middleware(
 async def health():
     return {"status": "ok"}
 
+@app.on_event("shutdown")
+async def shutdown():
+    await close_progress_hub()
+    await close_redis()
+
 # ---------------------------------------------------
 # Routers
 # ---------------------------------------------------
@@ -1,5 +1,5 @@
 # backend/app/models/email_result.py
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.db import Base
 
@@ -14,3 +14,7 @@ class EmailResult(Base):
     score = Column(Integer, default=0)
     checks = Column(JSON, default={})
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("uq_email_results_upload_normalized", "upload_id", "normalized", unique=True),
+    )
@@ -29,6 +29,11 @@ class Upload(Base):
     filename = Column(String, nullable=False)
     total_count = Column(Integer, default=0)
     processed_count = Column(Integer, default=0)
+    # per-status counters, bumped by the worker in the same transaction as
+    # the result rows so status reads never COUNT(*) email_results
+    valid_count = Column(Integer, nullable=False, default=0, server_default="0")
+    risky_count = Column(Integer, nullable=False, default=0, server_default="0")
+    invalid_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Use the real PostgreSQL ENUM
     # status = Column(upload_status_enum, nullable=False, default=UploadStatus.queued)
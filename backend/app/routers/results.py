@@ -1,20 +1,34 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-import io
-import csv
 
 from ..db import get_session
-from ..models.email_result import EmailResult
 from ..models.upload import Upload
+from ..services.export import (
+    iter_arrow_ipc,
+    iter_csv,
+    iter_ndjson,
+    iter_parquet,
+    iter_txt,
+    require_pyarrow,
+)
 
 router = APIRouter()
 
+# file_format -> (body generator, media type, needs pyarrow)
+EXPORT_FORMATS = {
+    "csv": (iter_csv, "text/csv", False),
+    "txt": (iter_txt, "text/plain", False),
+    "ndjson": (iter_ndjson, "application/x-ndjson", False),
+    "parquet": (iter_parquet, "application/vnd.apache.parquet", True),
+    "arrow": (iter_arrow_ipc, "application/vnd.apache.arrow.stream", True),
+}
+
 
 @router.get("/download/{upload_id}", response_model=None)
 async def download_results(
     upload_id: str,
-    file_format: str = Query("csv", regex="^(csv|txt)$"),
+    file_format: str = Query("csv", regex="^(csv|txt|ndjson|parquet|arrow)$"),
     session: AsyncSession = Depends(get_session),
 ):
     # Validate upload exists
@@ -22,58 +36,25 @@ async def download_results(
     if not upload:
         raise HTTPException(404, "Upload not found")
 
-    # --- FIX: Determine completion by counting results ---
-    q = await session.execute(
-        select(func.count()).select_from(EmailResult).where(EmailResult.upload_id == upload_id)
-    )
-    result_count = q.scalar_one() or 0
-
-    if result_count < (upload.total_count or 0):
+    # processed_count is bumped with every result flush, so no COUNT(*) here;
+    # total_count is NULL while the upload is still being ingested
+    if upload.total_count is None or (upload.processed_count or 0) < upload.total_count:
         raise HTTPException(400, "Upload not yet completed")
 
-    # Fetch all results
-    results = (
-        await session.execute(
-            select(EmailResult).where(EmailResult.upload_id == upload_id)
-        )
-    ).scalars().all()
-
-    headers = ["email", "normalized", "status", "score", "checks", "created_at"]
-
-    # CSV
-    if file_format == "csv":
-        buf = io.StringIO()
-        writer = csv.writer(buf)
-        writer.writerow(headers)
-        for r in results:
-            writer.writerow([
-                r.email,
-                r.normalized,
-                r.status,
-                r.score,
-                r.checks,
-                r.created_at,
-            ])
-        payload = ("\ufeff" + buf.getvalue()).encode("utf-8")
-        return Response(
-            payload,
-            media_type="text/csv",
-            headers={"Content-Disposition": f'attachment; filename=\"results_{upload_id}.csv\"'}
-        )
-
-    # TXT
-    if file_format == "txt":
-        buf = io.StringIO()
-        buf.write("\t".join(headers) + "\n")
-        for r in results:
-            buf.write(
-                f"{r.email}\t{r.normalized}\t{r.status}\t{r.score}\t{r.checks}\t{r.created_at}\n"
-            )
-        payload = buf.getvalue().encode("utf-8")
-        return Response(
-            payload,
-            media_type="text/plain",
-            headers={"Content-Disposition": f'attachment; filename=\"results_{upload_id}.txt\"'}
-        )
-
-    raise HTTPException(400, "Unsupported file format")
+    # Stream straight off a server-side cursor; memory stays flat and the
+    # first bytes go out before the query finishes
+    if file_format not in EXPORT_FORMATS:
+        raise HTTPException(400, "Unsupported file format")
+    iter_body, media_type, needs_pyarrow = EXPORT_FORMATS[file_format]
+    if needs_pyarrow:
+        # fail before the 200 goes out, not halfway through the body
+        try:
+            require_pyarrow()
+        except ImportError:
+            raise HTTPException(501, f"{file_format} export requires pyarrow")
+
+    return StreamingResponse(
+        iter_body(upload_id),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename=\"results_{upload_id}.{file_format}\"'}
+    )
@@ -1,10 +1,7 @@
 # backend/app/routers/uploads.py
+import asyncio
 import uuid
-import csv
-import io
 import json
-import openpyxl
-import xlrd
 
 from fastapi import (
     APIRouter,
@@ -13,17 +10,18 @@ from fastapi import (
     Depends,
     HTTPException,
     Path,
+    Request,
 )
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-
-import redis.asyncio as redis
+from sqlalchemy import select, update, case
 
 from ..config import settings
 from ..db import get_db
 from ..models.upload import Upload, UploadStatus
-from ..models.email_result import EmailResult
-from ..services.chunker import chunk_list
+from ..services.ingest import EmailDeduper, iter_upload_emails
+from ..services.progress import TERMINAL_STATUSES, get_progress_hub
+from ..services.queue import get_redis
 
 router = APIRouter()
 
@@ -54,58 +52,36 @@ async def safe_commit(db: AsyncSession, retries: int = 3):
             await asyncio.sleep(0.5 * attempt)
 
 # ---------------------------------------------------
-# Redis Pusher (SAFE, SYNC EXECUTION)
+# Redis Pusher (pooled client, batched RPUSH)
 # ---------------------------------------------------
 async def push_jobs_to_redis(payloads):
-    r = redis.from_url(settings.REDIS_URL)
-    for p in payloads:
-        await r.rpush(settings.QUEUE_KEY, json.dumps(p))
-    await r.close()
-
-# ---------------------------------------------------
-# CSV Parser
-# ---------------------------------------------------
-def parse_csv(content: bytes):
-    text = content.decode("utf-8", errors="ignore")
-    reader = csv.reader(io.StringIO(text))
-    emails = []
-    for row in reader:
-        if row:
-            c = next((v.strip() for v in row if v.strip()), None)
-            if c:
-                emails.append(c)
-    return emails
-
-# ---------------------------------------------------
-# XLSX Parser
-# ---------------------------------------------------
-def parse_xlsx(content: bytes):
-    workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True)
-    sheet = workbook.active
-    emails = []
-    for row in sheet.iter_rows(values_only=True):
-        if row:
-            c = next((str(v).strip() for v in row if v), None)
-            if c:
-                emails.append(c)
-    return emails
+    """
+    Enqueue payloads with multi-value RPUSH (ENQUEUE_BATCH_SIZE per command),
+    or one XADD each in stream mode; all commands pipelined into a single
+    round trip.
+    """
+    if not payloads:
+        return
+    pipe = get_redis().pipeline(transaction=False)
+    if settings.QUEUE_MODE == "stream":
+        for p in payloads:
+            pipe.xadd(settings.STREAM_KEY, {"payload": json.dumps(p)})
+    else:
+        batch = settings.ENQUEUE_BATCH_SIZE
+        for i in range(0, len(payloads), batch):
+            pipe.rpush(settings.QUEUE_KEY, *[json.dumps(p) for p in payloads[i:i + batch]])
+    await pipe.execute()
 
-# ---------------------------------------------------
-# XLS Parser
-# ---------------------------------------------------
-def parse_xls(content: bytes):
-    workbook = xlrd.open_workbook(file_contents=content)
-    sheet = workbook.sheet_by_index(0)
-    emails = []
-    for i in range(sheet.nrows):
-        row = sheet.row(i)
-        cleaned = [str(cell.value).strip() for cell in row if cell.value]
-        if cleaned:
-            emails.append(cleaned[0])
-    return emails
+async def cancel_upload(db: AsyncSession, upload_id: str):
+    await db.rollback()
+    await safe_execute(
+        db,
+        update(Upload).where(Upload.id == upload_id).values(status=UploadStatus.cancelled),
+    )
+    await safe_commit(db)
 
 # ---------------------------------------------------
-# FIXED UPLOAD ROUTE (NO BACKGROUNDTASKS)
+# STREAMING UPLOAD ROUTE
 # ---------------------------------------------------
 @router.post("/create")
 async def create_upload(
@@ -116,45 +92,86 @@ async def create_upload(
     if not fname.endswith((".csv", ".txt", ".xlsx", ".xls")):
         raise HTTPException(status_code=400, detail="Only CSV, TXT, XLSX, XLS allowed")
 
-    content = await file.read()
-
-    # Select parser
-    if fname.endswith(".xlsx"):
-        emails = parse_xlsx(content)
-    elif fname.endswith(".xls"):
-        emails = parse_xls(content)
-    else:
-        emails = parse_csv(content)
-
-    # Normalize + dedupe
-    normalized = list(dict.fromkeys([e.lower().strip() for e in emails if "@" in e]))
-
     upload_id = str(uuid.uuid4())
 
-    # Save upload row safely
+    # total_count stays NULL while the file is still arriving, so workers
+    # cannot mark the upload completed before every chunk is queued
     upload = Upload(
         id=upload_id,
         filename=file.filename,
-        total_count=len(normalized),
+        total_count=None,
         status=UploadStatus.queued,
     )
     db.add(upload)
     await safe_commit(db)
 
-    # Chunk email list
+    # Parse, normalize + dedupe and enqueue chunks while parsing the spooled
+    # upload (chunks go out ENQUEUE_BATCH_SIZE at a time)
     chunk_size = settings.CHUNK_SIZE
-    payloads = [
-        {"upload_id": upload_id, "emails": chunk}
-        for chunk in chunk_list(normalized, chunk_size)
-    ]
+    deduper = EmailDeduper()
+    chunk = []
+    pending = []
+    total = 0
+    chunks = 0
+    try:
+        async for raw in iter_upload_emails(file):
+            email = raw.lower().strip()
+            if "@" not in email or not deduper.add(email):
+                continue
+            chunk.append(email)
+            total += 1
+            if len(chunk) >= chunk_size:
+                pending.append({"upload_id": upload_id, "emails": chunk})
+                chunks += 1
+                chunk = []
+                if len(pending) >= settings.ENQUEUE_BATCH_SIZE:
+                    try:
+                        await push_jobs_to_redis(pending)
+                    except Exception as e:
+                        # chunks pushed so far stay queued; workers skip them
+                        await cancel_upload(db, upload_id)
+                        raise HTTPException(status_code=503, detail=f"Failed to enqueue upload: {e}")
+                    pending = []
+        if chunk:
+            pending.append({"upload_id": upload_id, "emails": chunk})
+            chunks += 1
+    except HTTPException:
+        raise
+    except Exception as e:
+        await cancel_upload(db, upload_id)
+        raise HTTPException(status_code=400, detail=f"Failed to read upload: {e}")
+
+    # The final batch must be queued before total_count is committed:
+    # a total with missing chunks would leave the upload processing forever
+    try:
+        await push_jobs_to_redis(pending)
+    except Exception as e:
+        await cancel_upload(db, upload_id)
+        raise HTTPException(status_code=503, detail=f"Failed to enqueue upload: {e}")
 
-    # Push synchronously
-    await push_jobs_to_redis(payloads)
+    # Workers may already have finished every chunk; decide completion here too
+    try:
+        await safe_execute(
+            db,
+            update(Upload)
+            .where(Upload.id == upload_id)
+            .values(
+                total_count=total,
+                status=case(
+                    (Upload.processed_count >= total, UploadStatus.completed.value),
+                    else_=Upload.status,
+                ),
+            ),
+        )
+        await safe_commit(db)
+    except Exception:
+        await cancel_upload(db, upload_id)
+        raise
 
     return {
         "upload_id": upload_id,
-        "total": len(normalized),
-        "chunks": len(payloads),
+        "total": total,
+        "chunks": chunks,
     }
 
 # ---------------------------------------------------
@@ -171,19 +188,76 @@ async def get_upload_status(
     if not upload:
         raise HTTPException(status_code=404, detail="upload not found")
 
-    q2 = await safe_execute(
-        db,
-        select(func.count()).select_from(EmailResult).where(EmailResult.upload_id == upload_id),
-    )
-    inserted = q2.scalar_one() or 0
+    return status_payload(upload)
+
 
+def status_payload(upload: Upload) -> dict:
     chunk_size = settings.CHUNK_SIZE
     chunks = (upload.total_count + chunk_size - 1) // chunk_size if upload.total_count else 0
 
     return {
         "upload_id": upload.id,
         "status": str(upload.status),
-        "processed": int(inserted),
+        # counters are maintained by the worker on every flush: O(1) read
+        "processed": int(upload.processed_count or 0),
         "total": int(upload.total_count or 0),
+        "valid": int(upload.valid_count or 0),
+        "risky": int(upload.risky_count or 0),
+        "invalid": int(upload.invalid_count or 0),
         "chunks": int(chunks),
     }
+
+
+def _sse(data: dict, event: str = "progress") -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# ---------------------------------------------------
+# Progress stream (Server-Sent Events)
+# ---------------------------------------------------
+@router.get("/{upload_id}/events")
+async def upload_events(
+    request: Request,
+    upload_id: str = Path(...),
+    db: AsyncSession = Depends(get_db),
+):
+    # Subscribe, and wait for Redis to confirm the subscription, before
+    # reading the snapshot so an update published in between is not lost;
+    # after that, the stream touches Redis only. If Redis is slow to
+    # confirm, the stream still starts (the next update catches it up).
+    hub = get_progress_hub()
+    watcher = hub.subscribe(upload_id)
+    try:
+        await hub.wait_subscribed()
+        q = await safe_execute(db, select(Upload).where(Upload.id == upload_id))
+        upload = q.scalars().first()
+    except Exception:
+        hub.unsubscribe(watcher)
+        raise
+    if not upload:
+        hub.unsubscribe(watcher)
+        raise HTTPException(status_code=404, detail="upload not found")
+    snapshot = status_payload(upload)
+
+    async def stream():
+        try:
+            yield _sse(snapshot)
+            if snapshot["status"] in TERMINAL_STATUSES:
+                return
+            async for progress in hub.updates(watcher):
+                if await request.is_disconnected():
+                    break
+                if progress is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(dict(snapshot, **progress))
+                if progress.get("status") in TERMINAL_STATUSES:
+                    break
+        finally:
+            hub.unsubscribe(watcher)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,203 @@
+# backend/app/services/export.py
+# Streaming result export: rows come off a server-side cursor in batches of
+# plain column tuples (no ORM objects) and are encoded block by block.
+# Columnar formats need pyarrow, which is imported only when requested.
+import csv
+import io
+import json
+from datetime import timezone
+
+from sqlalchemy import select
+
+from ..config import settings
+from ..db import get_session_maker
+from ..models.email_result import EmailResult
+
+EXPORT_HEADERS = ["email", "normalized", "status", "score", "checks", "created_at"]
+
+_EXPORT_COLUMNS = (
+    EmailResult.email,
+    EmailResult.normalized,
+    EmailResult.status,
+    EmailResult.score,
+    EmailResult.checks,
+    EmailResult.created_at,
+)
+
+
+async def iter_result_batches(upload_id: str, batch_size: int = None):
+    """
+    Yield lists of result row tuples for an upload, in insertion order.
+    Opens its own session: a StreamingResponse body runs after the request's
+    dependencies have been torn down.
+    """
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    stmt = (
+        select(*_EXPORT_COLUMNS)
+        .where(EmailResult.upload_id == upload_id)
+        .order_by(EmailResult.id)
+        .execution_options(yield_per=batch_size)
+    )
+    SessionLocal = get_session_maker()
+    async with SessionLocal() as session:
+        result = await session.stream(stmt)
+        async for rows in result.partitions():
+            yield rows
+
+
+async def iter_csv(upload_id: str):
+    # BOM so Excel opens the file as UTF-8
+    buf = io.StringIO()
+    buf.write("\ufeff")
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_HEADERS)
+    yield buf.getvalue().encode("utf-8")
+    async for rows in iter_result_batches(upload_id):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+
+
+async def iter_txt(upload_id: str):
+    yield ("\t".join(EXPORT_HEADERS) + "\n").encode("utf-8")
+    async for rows in iter_result_batches(upload_id):
+        yield "".join(
+            f"{email}\t{normalized}\t{status}\t{score}\t{checks}\t{created_at}\n"
+            for email, normalized, status, score, checks, created_at in rows
+        ).encode("utf-8")
+
+
+# checks fields flattened into typed columns for the columnar/NDJSON formats
+FLAT_HEADERS = [
+    "email", "normalized", "status", "score",
+    "has_mx", "disposable", "catch_all", "provider", "mx_records",
+    "created_at",
+]
+
+
+def _flat_row(row) -> dict:
+    email, normalized, status, score, checks, created_at = row
+    checks = checks or {}
+    catch_all = checks.get("catch_all")
+    return {
+        "email": email,
+        "normalized": normalized,
+        "status": status,
+        "score": score,
+        "has_mx": bool(checks.get("has_mx")),
+        "disposable": bool(checks.get("disposable")),
+        "catch_all": None if catch_all is None else bool(catch_all),
+        "provider": checks.get("provider"),
+        "mx_records": list(checks.get("mx_records") or []),
+        "created_at": created_at,
+    }
+
+
+async def iter_ndjson(upload_id: str):
+    async for rows in iter_result_batches(upload_id):
+        lines = []
+        for row in rows:
+            flat = _flat_row(row)
+            if flat["created_at"] is not None:
+                flat["created_at"] = flat["created_at"].isoformat()
+            lines.append(json.dumps(flat, separators=(",", ":")))
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def require_pyarrow():
+    """Import pyarrow or raise ImportError; call before starting a response."""
+    import pyarrow  # noqa: F401
+    return pyarrow
+
+
+def _arrow_schema(pa):
+    return pa.schema([
+        ("email", pa.string()),
+        ("normalized", pa.string()),
+        ("status", pa.string()),
+        ("score", pa.int32()),
+        ("has_mx", pa.bool_()),
+        ("disposable", pa.bool_()),
+        ("catch_all", pa.bool_()),
+        ("provider", pa.string()),
+        ("mx_records", pa.list_(pa.string())),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+    ])
+
+
+def _record_batch(pa, schema, rows):
+    columns = {name: [] for name in FLAT_HEADERS}
+    for row in rows:
+        flat = _flat_row(row)
+        created_at = flat["created_at"]
+        if created_at is not None and created_at.tzinfo is None:
+            flat["created_at"] = created_at.replace(tzinfo=timezone.utc)
+        for name in FLAT_HEADERS:
+            columns[name].append(flat[name])
+    return pa.RecordBatch.from_arrays(
+        [pa.array(columns[f.name], type=f.type) for f in schema], schema=schema
+    )
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that collects whatever the writer emitted
+    since the last drain(), so encoded bytes can be yielded as they appear."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        data = bytes(b)
+        self._chunks.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def _iter_arrow(upload_id: str, open_writer):
+    pa = require_pyarrow()
+    schema = _arrow_schema(pa)
+    sink = _ChunkSink()
+    writer = open_writer(pa, pa.PythonFile(sink, mode="w"), schema)
+    try:
+        async for rows in iter_result_batches(upload_id):
+            writer.write_batch(_record_batch(pa, schema, rows))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _parquet_writer(pa, sink, schema):
+    import pyarrow.parquet as pq
+    return pq.ParquetWriter(sink, schema, compression="zstd")
+
+
+def _ipc_writer(pa, sink, schema):
+    return pa.ipc.new_stream(sink, schema)
+
+
+async def iter_parquet(upload_id: str):
+    # one row group per cursor batch; the footer is written on close
+    async for chunk in _iter_arrow(upload_id, _parquet_writer):
+        yield chunk
+
+
+async def iter_arrow_ipc(upload_id: str):
+    async for chunk in _iter_arrow(upload_id, _ipc_writer):
+        yield chunk
@@ -0,0 +1,171 @@
+# backend/app/services/ingest.py
+# Streaming upload parsing: rows are read from the UploadFile in blocks and
+# yielded one email at a time, so parsing memory does not grow with file
+# size; only the deduper's 8-byte digests do.
+import codecs
+import csv
+import hashlib
+from array import array
+
+import openpyxl
+import xlrd
+
+READ_BLOCK_SIZE = 1024 * 1024
+# a quoted field still open after this many lines is a stray quote, not a
+# multi-line field; parse it as-is rather than buffer the rest of the file
+MAX_RECORD_LINES = 1000
+
+
+class EmailDeduper:
+    """
+    Compact "seen" set for normalized emails: 64-bit blake2b digests in an
+    open-addressing table over array('Q'), 8 bytes per slot and at most
+    two thirds full, so about 12-24 bytes per distinct email instead of a
+    Python object per entry. Digest 0 marks an empty slot.
+    """
+    def __init__(self, capacity: int = 1 << 16):
+        self._slots = array("Q", bytes(8 * capacity))
+        self._mask = capacity - 1
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @staticmethod
+    def _digest(email: str) -> int:
+        h = int.from_bytes(
+            hashlib.blake2b(email.encode("utf-8"), digest_size=8).digest(), "little"
+        )
+        return h or 1
+
+    def _grow(self):
+        old = self._slots
+        capacity = len(old) * 2
+        slots = array("Q", bytes(8 * capacity))
+        mask = capacity - 1
+        for h in old:
+            if h:
+                i = h & mask
+                while slots[i]:
+                    i = (i + 1) & mask
+                slots[i] = h
+        self._slots = slots
+        self._mask = mask
+
+    def add(self, email: str) -> bool:
+        """Record email; return False if it was already seen."""
+        h = self._digest(email)
+        slots, mask = self._slots, self._mask
+        i = h & mask
+        while True:
+            v = slots[i]
+            if not v:
+                break
+            if v == h:
+                return False
+            i = (i + 1) & mask
+        slots[i] = h
+        self._count += 1
+        if self._count * 3 > len(slots) * 2:
+            self._grow()
+        return True
+
+
+async def iter_text_lines(file, block_size: int = READ_BLOCK_SIZE):
+    """
+    Yield lists of complete text lines (with their "\n"), decoding the
+    upload block by block.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    pending = ""
+    while True:
+        block = await file.read(block_size)
+        if not block:
+            break
+        lines = (pending + decoder.decode(block)).split("\n")
+        pending = lines.pop()
+        if lines:
+            yield [line + "\n" for line in lines]
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield [pending]
+
+
+def _split_open_record(lines):
+    """
+    Split off the trailing lines of a record whose quoted field is still
+    open (odd number of quote characters so far); "" escapes count twice,
+    so parity is exact.
+    """
+    quotes = 0
+    start = 0
+    for i, line in enumerate(lines):
+        if not quotes % 2:
+            start = i
+        quotes += line.count('"')
+    if quotes % 2:
+        return lines[:start], lines[start:]
+    return lines, []
+
+
+def _first_cells(lines):
+    for row in csv.reader(lines):
+        if row:
+            c = next((v.strip() for v in row if v.strip()), None)
+            if c:
+                yield c
+
+
+async def iter_csv_emails(file):
+    """First non-empty cell of every CSV/TXT row."""
+    # a quoted field may span read blocks: carry its lines to the next one
+    carry = []
+    async for lines in iter_text_lines(file):
+        complete, carry = _split_open_record(carry + lines)
+        if len(carry) > MAX_RECORD_LINES:
+            complete, carry = complete + carry, []
+        for c in _first_cells(complete):
+            yield c
+    for c in _first_cells(carry):
+        yield c
+
+
+def iter_xlsx_emails(fileobj):
+    """First non-empty cell of every row; read_only mode streams the sheet."""
+    workbook = openpyxl.load_workbook(fileobj, read_only=True)
+    try:
+        sheet = workbook.active
+        for row in sheet.iter_rows(values_only=True):
+            if row:
+                c = next((str(v).strip() for v in row if v), None)
+                if c:
+                    yield c
+    finally:
+        workbook.close()
+
+
+def iter_xls_emails(content: bytes):
+    # legacy .xls (max 65536 rows) has no streaming reader; xlrd needs the bytes
+    workbook = xlrd.open_workbook(file_contents=content)
+    sheet = workbook.sheet_by_index(0)
+    for i in range(sheet.nrows):
+        row = sheet.row(i)
+        cleaned = [str(cell.value).strip() for cell in row if cell.value]
+        if cleaned:
+            yield cleaned[0]
+
+
+async def iter_upload_emails(file):
+    """Dispatch on extension and yield raw email cells from the upload."""
+    fname = (file.filename or "").lower()
+    if fname.endswith(".xlsx"):
+        # UploadFile is a SpooledTemporaryFile: large uploads are already on disk
+        await file.seek(0)
+        for email in iter_xlsx_emails(file.file):
+            yield email
+    elif fname.endswith(".xls"):
+        for email in iter_xls_emails(await file.read()):
+            yield email
+    else:
+        async for email in iter_csv_emails(file):
+            yield email
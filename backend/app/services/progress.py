@@ -0,0 +1,161 @@
+# backend/app/services/progress.py
+import asyncio
+import json
+import logging
+from typing import Dict, Optional, Set
+
+from ..config import settings
+from .queue import get_redis
+
+logger = logging.getLogger("mailscout.progress")
+
+TERMINAL_STATUSES = ("completed", "cancelled")
+
+
+def progress_channel(upload_id: str) -> str:
+    return f"{settings.PROGRESS_CHANNEL_PREFIX}:{upload_id}"
+
+
+class ProgressWatcher:
+    """Latest-only mailbox for one SSE client: a new update replaces an unread one."""
+    __slots__ = ("upload_id", "latest", "event")
+
+    def __init__(self, upload_id: str):
+        self.upload_id = upload_id
+        self.latest: Optional[dict] = None
+        self.event = asyncio.Event()
+
+    def put(self, update: dict) -> None:
+        self.latest = update
+        self.event.set()
+
+    def take(self) -> Optional[dict]:
+        update, self.latest = self.latest, None
+        self.event.clear()
+        return update
+
+
+class ProgressHub:
+    """
+    One PSUBSCRIBE per API process, fanned out to every SSE watcher, so the
+    number of open progress streams costs neither Redis connections nor DB
+    queries. Watchers only ever hold the newest update and read at most one
+    per min_interval, which coalesces bursts from many workers.
+    """
+    def __init__(self, prefix: str, min_interval: float = 0.25):
+        self._prefix = f"{prefix}:"
+        self._min_interval = min_interval
+        self._watchers: Dict[str, Set[ProgressWatcher]] = {}
+        self._task: Optional[asyncio.Task] = None
+        # set once Redis confirmed the PSUBSCRIBE, cleared while resubscribing
+        self._subscribed = asyncio.Event()
+
+    def subscribe(self, upload_id: str) -> ProgressWatcher:
+        watcher = ProgressWatcher(upload_id)
+        self._watchers.setdefault(upload_id, set()).add(watcher)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+        return watcher
+
+    async def wait_subscribed(self, timeout: float = 2.0) -> bool:
+        """
+        Wait until the pattern subscription is live, so anything published
+        from now on reaches the watchers. False if Redis did not confirm in time.
+        """
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def unsubscribe(self, watcher: ProgressWatcher) -> None:
+        watchers = self._watchers.get(watcher.upload_id)
+        if watchers is None:
+            return
+        watchers.discard(watcher)
+        if not watchers:
+            del self._watchers[watcher.upload_id]
+
+    async def updates(self, watcher: ProgressWatcher, keepalive: float = 15.0):
+        """Yield coalesced updates for watcher, or None every keepalive seconds of silence."""
+        loop = asyncio.get_running_loop()
+        last = 0.0
+        while True:
+            try:
+                await asyncio.wait_for(watcher.event.wait(), keepalive)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            wait = last + self._min_interval - loop.time()
+            if wait > 0:
+                # anything published meanwhile replaces the pending update
+                await asyncio.sleep(wait)
+            last = loop.time()
+            update = watcher.take()
+            if update is not None:
+                yield update
+
+    def _dispatch(self, channel, data) -> None:
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        watchers = self._watchers.get(channel[len(self._prefix):])
+        if not watchers:
+            return
+        try:
+            update = json.loads(data)
+        except ValueError:
+            return
+        for watcher in watchers:
+            watcher.put(update)
+
+    async def _listen(self) -> None:
+        while True:
+            # subscribe confirmations are kept: they mark the subscription live
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.psubscribe(f"{self._prefix}*")
+                while True:
+                    msg = await pubsub.get_message(timeout=1.0)
+                    if msg is None:
+                        continue
+                    if msg.get("type") == "pmessage":
+                        self._dispatch(msg["channel"], msg["data"])
+                    elif msg.get("type") == "psubscribe":
+                        self._subscribed.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Progress subscription failed, resubscribing: %s", e)
+                await asyncio.sleep(1.0)
+            finally:
+                self._subscribed.clear()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+_hub: Optional[ProgressHub] = None
+
+
+def get_progress_hub() -> ProgressHub:
+    global _hub
+    if _hub is None:
+        _hub = ProgressHub(
+            settings.PROGRESS_CHANNEL_PREFIX,
+            min_interval=settings.PROGRESS_MIN_INTERVAL,
+        )
+    return _hub
+
+
+async def close_progress_hub():
+    global _hub
+    if _hub is not None:
+        await _hub.close()
+        _hub = None
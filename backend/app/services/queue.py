@@ -0,0 +1,25 @@
+# backend/app/services/queue.py
+import redis.asyncio as redis
+
+from ..config import settings
+
+# Lazily-created, process-wide Redis client (one connection pool per API
+# process instead of a new client per request)
+_client = None
+
+
+def get_redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+        )
+    return _client
+
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -43,3 +43,51 @@ export const UPLOAD_STATUS_API = `${API_URL}/uploads/status`;
 
 // DOWNLOAD endpoint — ALWAYS correct because API_URL is forced
 export const DOWNLOAD_RESULTS_API = `${API_URL}/results/download`;
+
+// Upload status snapshot (counters only, cheap)
+export async function getUploadStatus(uploadId) {
+  return apiGet(`/uploads/${uploadId}`);
+}
+
+const TERMINAL_STATUSES = ["completed", "cancelled"];
+
+// Live progress over Server-Sent Events. Calls onProgress with each status
+// payload and closes itself once the upload is finished. If the browser has
+// no EventSource or the stream cannot be opened, onFallback is called so the
+// caller can poll getUploadStatus instead. Returns a function that closes it.
+export function subscribeUploadProgress(uploadId, onProgress, onFallback) {
+  if (typeof window === "undefined" || !window.EventSource) {
+    onFallback();
+    return () => {};
+  }
+
+  const source = new EventSource(`${API_URL}/uploads/${uploadId}/events`);
+  let received = false;
+  let closed = false;
+
+  const close = () => {
+    closed = true;
+    source.close();
+  };
+
+  source.addEventListener("progress", (e) => {
+    received = true;
+    const payload = JSON.parse(e.data);
+    onProgress(payload);
+    if (TERMINAL_STATUSES.includes(String(payload.status).toLowerCase())) {
+      close();
+    }
+  });
+
+  source.onerror = () => {
+    if (closed) return;
+    // EventSource retries on its own after a dropped stream; only give up
+    // when it never connected or the browser stopped retrying
+    if (!received || source.readyState === EventSource.CLOSED) {
+      close();
+      onFallback();
+    }
+  };
+
+  return close;
+}
@@ -1,6 +1,6 @@
 // frontend/src/components/ProgressTracker.jsx
 import { useEffect, useState } from "react";
-import { getUploadStatus } from "../api";
+import { getUploadStatus, subscribeUploadProgress } from "../api";
 
 export default function ProgressTracker({ uploadId }) {
   const [data, setData] = useState({
@@ -13,22 +13,32 @@ export default function ProgressTracker({ uploadId }) {
   useEffect(() => {
     if (!uploadId) return;
 
-    const interval = setInterval(async () => {
-      try {
-        const json = await getUploadStatus(uploadId);
-
-        setData({
-          status: json.status ?? "queued",
-          processed: json.processed_count ?? 0,
-          total: json.total_count ?? 0,
-          chunks: json.chunks ?? 0,
-        });
-      } catch (error) {
-        console.error("Polling error:", error);
-      }
-    }, 2000);
-
-    return () => clearInterval(interval);
+    const apply = (json) =>
+      setData({
+        status: json.status ?? "queued",
+        processed: json.processed ?? json.processed_count ?? 0,
+        total: json.total ?? json.total_count ?? 0,
+        chunks: json.chunks ?? 0,
+      });
+
+    let interval = null;
+    const startPolling = () => {
+      if (interval) return;
+      interval = setInterval(async () => {
+        try {
+          apply(await getUploadStatus(uploadId));
+        } catch (error) {
+          console.error("Polling error:", error);
+        }
+      }, 2000);
+    };
+
+    const unsubscribe = subscribeUploadProgress(uploadId, apply, startPolling);
+
+    return () => {
+      unsubscribe();
+      if (interval) clearInterval(interval);
+    };
   }, [uploadId]);
 
   const percentage =
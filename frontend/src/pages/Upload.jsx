@@ -1,7 +1,7 @@
 // frontend/src/pages/Upload.jsx
 import React, { useState, useEffect, useRef } from "react";
 import FileUpload from "../components/FileUpload";
-import { apiGet } from "../api";
+import { apiGet, subscribeUploadProgress } from "../api";
 import { DOWNLOAD_RESULTS_API } from "../api";
 
 const POLL_INTERVAL_ACTIVE = 2000;
@@ -52,21 +52,36 @@ export default function Upload() {
       return;
     }
 
-    (async () => {
-      await fetchOnce(uploadId);
-    })();
-
-    pollingRef.current = setInterval(async () => {
-      const res = await fetchOnce(uploadId);
-      if (!res) return;
-      const s = String(res.status).toLowerCase();
-      if (["completed", "cancelled", "failed", "done"].includes(s) || res.percent >= 100) {
-        clearInterval(pollingRef.current);
-        pollingRef.current = null;
-      }
-    }, POLL_INTERVAL_ACTIVE);
+    const startPolling = () => {
+      if (pollingRef.current) return;
+
+      (async () => {
+        await fetchOnce(uploadId);
+      })();
+
+      pollingRef.current = setInterval(async () => {
+        const res = await fetchOnce(uploadId);
+        if (!res) return;
+        const s = String(res.status).toLowerCase();
+        if (["completed", "cancelled", "failed", "done"].includes(s) || res.percent >= 100) {
+          clearInterval(pollingRef.current);
+          pollingRef.current = null;
+        }
+      }, POLL_INTERVAL_ACTIVE);
+    };
+
+    // Server-pushed progress; falls back to polling if the stream is unavailable
+    const unsubscribe = subscribeUploadProgress(
+      uploadId,
+      (payload) => {
+        setError(null);
+        setProgress(normalizeStatusPayload(payload));
+      },
+      startPolling
+    );
 
     return () => {
+      unsubscribe();
       if (pollingRef.current) clearInterval(pollingRef.current);
       pollingRef.current = null;
     };
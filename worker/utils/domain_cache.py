@@ -0,0 +1,72 @@
+# worker/utils/domain_cache.py
+import json
+import logging
+from typing import Any, Dict, Iterable
+
+LOG = logging.getLogger("mailscout-worker")
+
+
+class DomainCache:
+    """
+    Cross-worker cache of domain-level facts (MX, catch-all, provider,
+    disposable) stored in Redis, so a freshly scaled worker starts warm.
+    Keys embed a version; bump it to invalidate every entry at once after
+    a verifier or scoring change. The stored disposable flag is only
+    informational: the worker recomputes it from the live list on read.
+    """
+    def __init__(
+        self,
+        prefix: str = "mailscout:domain",
+        version: str = "1",
+        ttl_seconds: int = 86400,
+        negative_ttl_seconds: int = 3600,
+        batch_size: int = 500,
+    ):
+        self._prefix = f"{prefix}:v{version}"
+        self._ttl = ttl_seconds
+        self._negative_ttl = negative_ttl_seconds
+        self._batch_size = batch_size
+
+    def _key(self, domain: str) -> str:
+        return f"{self._prefix}:{domain}"
+
+    async def get_many(self, r, domains: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Batch-read facts for all domains (one MGET per batch_size domains)."""
+        domains = [d for d in domains if d]
+        found: Dict[str, Dict[str, Any]] = {}
+        for i in range(0, len(domains), self._batch_size):
+            batch = domains[i:i + self._batch_size]
+            try:
+                raws = await r.mget([self._key(d) for d in batch])
+            except Exception as e:
+                LOG.debug("Domain cache read failed: %s", e)
+                return found
+            for domain, raw in zip(batch, raws):
+                if not raw:
+                    continue
+                try:
+                    found[domain] = json.loads(raw)
+                except ValueError:
+                    continue
+        return found
+
+    async def set_many(self, r, facts: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Write facts in one pipelined round trip. Domains without MX or with
+        an unknown catch-all verdict get the short TTL so they are re-checked,
+        unless the verdict is unknown because the provider policy skips SMTP.
+        """
+        facts = {d: f for d, f in facts.items() if d}
+        if not facts:
+            return
+        try:
+            pipe = r.pipeline(transaction=False)
+            for domain, f in facts.items():
+                settled = f.get("has_mx") and (
+                    f.get("catch_all") is not None or f.get("smtp_policy") == "skip"
+                )
+                ttl = self._ttl if settled else self._negative_ttl
+                pipe.set(self._key(domain), json.dumps(f), ex=ttl)
+            await pipe.execute()
+        except Exception as e:
+            LOG.debug("Domain cache write failed: %s", e)
@@ -0,0 +1,235 @@
+# worker/utils/greylist.py
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+LOG = logging.getLogger("mailscout-worker")
+
+# Atomically take up to ARGV[2] entries due by ARGV[1] and push their score
+# to ARGV[3] (the lease expiry), so concurrent workers never claim the same
+# entry and a worker that dies mid-probe only delays it until the lease ends.
+_CLAIM_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    redis.call('ZADD', KEYS[1], ARGV[3], member)
+end
+return due
+"""
+
+# Store an entry and schedule it on this worker's set (KEYS[1]), unless the
+# stored copy is at the same or a later attempt: a retried chunk deferring
+# the address again with attempt 1 must not reset its backoff. An entry
+# taken over from another worker's set (KEYS[3]) moves to ours.
+_DEFER_SCRIPT = """
+local current = redis.call('HGET', KEYS[2], ARGV[1])
+if current then
+    local ok, entry = pcall(cjson.decode, current)
+    if ok and type(entry) == 'table'
+        and (tonumber(entry['attempt']) or 0) >= tonumber(ARGV[3]) then
+        return 0
+    end
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+if KEYS[3] ~= KEYS[1] then
+    redis.call('ZREM', KEYS[3], ARGV[1])
+end
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[1])
+return 1
+"""
+
+
+class GreylistQueue:
+    """
+    Deferred RCPT re-probes for greylisted (450/451) addresses. Greylisting
+    keys on the client IP, so an entry is re-probed by the worker that
+    deferred it (same machine, same egress): every worker has its own
+    sorted set "{key}:q:{worker_id}" scored by due time, with the payloads
+    in a shared hash. The member is "{upload_id}|{email}", so deferring the
+    same address twice (e.g. after a chunk retry) keeps one entry.
+
+    A background loop claims due entries from the worker's own set in
+    batches and hands them to a handler; nothing waits in-line for a
+    greylist delay. A claim is a lease that is renewed while the handler
+    runs. Sets of workers whose heartbeat has expired are taken over by
+    the others, so a destroyed machine does not strand its entries.
+    """
+    def __init__(
+        self,
+        key: str = "mailscout:greylist",
+        worker_id: str = "worker",
+        base_delay: float = 300.0,
+        max_delay: float = 3600.0,
+        max_attempts: int = 4,
+        batch_size: int = 100,
+        poll_interval: float = 2.0,
+        lease: float = 120.0,
+    ):
+        self.key = key
+        self.worker_id = worker_id
+        self.data_key = f"{key}:data"
+        self.queue_prefix = f"{key}:q:"
+        self.alive_prefix = f"{key}:alive:"
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._r = None
+        self._claim = None
+        self._defer = None
+        self._task = None
+        self._beat_at = 0.0
+        self._takeover_at = 0.0
+
+    @staticmethod
+    def member(entry: Dict[str, Any]) -> str:
+        return f"{entry['upload_id']}|{entry['email']}"
+
+    def queue_key(self, worker_id: str) -> str:
+        return f"{self.queue_prefix}{worker_id}"
+
+    def delay(self, attempt: int) -> float:
+        """Backoff before re-probe number `attempt` (1-based)."""
+        return min(self.max_delay, self.base_delay * (2 ** max(0, attempt - 1)))
+
+    def exhausted(self, entry: Dict[str, Any]) -> bool:
+        return int(entry.get("attempt") or 0) >= self.max_attempts
+
+    async def defer(self, entry: Dict[str, Any]) -> bool:
+        """
+        Schedule entry's next re-probe on this worker (entry["attempt"]
+        probes done so far). Returns False when a copy at the same or a
+        later attempt is already queued; that one is kept.
+        """
+        attempt = int(entry.get("attempt") or 1)
+        due = time.time() + self.delay(attempt)
+        previous = entry.get("owner") or self.worker_id
+        entry = dict(entry, owner=self.worker_id)
+        stored = await self._defer(
+            keys=[self.queue_key(self.worker_id), self.data_key, self.queue_key(previous)],
+            args=[self.member(entry), json.dumps(entry), attempt, due],
+        )
+        return bool(stored)
+
+    async def done(self, entries: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        pipe = self._r.pipeline(transaction=True)
+        for entry in entries:
+            owner = entry.get("owner") or self.worker_id
+            pipe.zrem(self.queue_key(owner), self.member(entry))
+        pipe.hdel(self.data_key, *[self.member(e) for e in entries])
+        await pipe.execute()
+
+    async def claim(self, queue_key: str) -> List[Dict[str, Any]]:
+        now = time.time()
+        members = await self._claim(
+            keys=[queue_key], args=[now, self.batch_size, now + self.lease]
+        )
+        if not members:
+            return []
+        raws = await self._r.hmget(self.data_key, members)
+        owner = queue_key[len(self.queue_prefix):]
+        entries = []
+        stale = []
+        for member, raw in zip(members, raws):
+            try:
+                entry = json.loads(raw)
+            except (TypeError, ValueError):
+                stale.append(member)
+                continue
+            # the set it was claimed from is authoritative
+            entry["owner"] = owner
+            entries.append(entry)
+        if stale:
+            await self._r.zrem(queue_key, *stale)
+        return entries
+
+    async def _abandoned_queues(self) -> List[str]:
+        """Sets of other workers whose heartbeat has expired."""
+        found = []
+        async for queue_key in self._r.scan_iter(match=f"{self.queue_prefix}*"):
+            if isinstance(queue_key, bytes):
+                queue_key = queue_key.decode()
+            worker_id = queue_key[len(self.queue_prefix):]
+            if worker_id == self.worker_id:
+                continue
+            if not await self._r.exists(f"{self.alive_prefix}{worker_id}"):
+                found.append(queue_key)
+        return found
+
+    async def start(self, r, handler: Callable[[List[Dict[str, Any]]], Awaitable[None]]) -> None:
+        self._r = r
+        self._claim = r.register_script(_CLAIM_SCRIPT)
+        self._defer = r.register_script(_DEFER_SCRIPT)
+        await self._beat()
+        self._task = asyncio.create_task(self._loop(handler))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _beat(self) -> None:
+        # other workers take our set over once this expires
+        await self._r.set(f"{self.alive_prefix}{self.worker_id}", "1", px=int(self.lease * 1000))
+        self._beat_at = time.monotonic()
+
+    async def _renew(self, queue_key: str, members: List[str]) -> None:
+        """Push the lease of still-claimed members forward until cancelled."""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                # XX: entries already done stay gone; GT: an entry the
+                # handler re-deferred keeps its later due time
+                await self._r.zadd(
+                    queue_key, {m: time.time() + self.lease for m in members}, xx=True, gt=True
+                )
+            except Exception as e:
+                LOG.warning("Greylist lease renewal failed: %s", e)
+
+    async def _next_batch(self):
+        if time.monotonic() - self._beat_at >= self.lease / 3:
+            await self._beat()
+        own = self.queue_key(self.worker_id)
+        entries = await self.claim(own)
+        if entries:
+            return own, entries
+        if time.monotonic() - self._takeover_at < self.lease:
+            return own, []
+        self._takeover_at = time.monotonic()
+        for queue_key in await self._abandoned_queues():
+            entries = await self.claim(queue_key)
+            if entries:
+                LOG.warning("Taking over %d greylist entr(ies) from %s", len(entries), queue_key)
+                return queue_key, entries
+        return own, []
+
+    async def _loop(self, handler) -> None:
+        while True:
+            try:
+                queue_key, entries = await self._next_batch()
+            except Exception as e:
+                LOG.warning("Greylist claim failed: %s", e)
+                entries = []
+            if not entries:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            renew = asyncio.create_task(
+                self._renew(queue_key, [self.member(e) for e in entries])
+            )
+            try:
+                await handler(entries)
+            except Exception:
+                # leased entries become due again when the lease runs out
+                LOG.exception("Greylist re-probe batch failed (%d entries)", len(entries))
+            finally:
+                renew.cancel()
+                await asyncio.gather(renew, return_exceptions=True)
+
+    async def pending(self) -> int:
+        return await self._r.zcard(self.queue_key(self.worker_id))
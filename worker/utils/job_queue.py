@@ -0,0 +1,426 @@
+# worker/utils/job_queue.py
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+LOG = logging.getLogger("mailscout-worker")
+
+# Move one job from a dead worker's processing list (KEYS[1]) back to the
+# queue head (KEYS[2]) with attempts + 1, or to the dead list (KEYS[3]) once
+# ARGV[1] attempts are used up, so a chunk that keeps killing its worker
+# does not cycle forever. Returns nil when the list is empty, and
+# {2, payload} for a dead-lettered job so its on_dead hook can run.
+_REAP_SCRIPT = """
+local raw = redis.call('RPOP', KEYS[1])
+if not raw then return nil end
+local ok, payload = pcall(cjson.decode, raw)
+if not ok or type(payload) ~= 'table' then
+    -- fetch() drops undecodable payloads
+    redis.call('LPUSH', KEYS[2], raw)
+    return 0
+end
+local attempts = (tonumber(payload['attempts']) or 0) + 1
+payload['attempts'] = attempts
+if attempts >= tonumber(ARGV[1]) then
+    local encoded = cjson.encode(payload)
+    redis.call('RPUSH', KEYS[3], encoded)
+    return {2, encoded}
+end
+redis.call('LPUSH', KEYS[2], cjson.encode(payload))
+return 1
+"""
+
+
+class Job:
+    __slots__ = ("raw", "payload", "id")
+
+    def __init__(self, raw: str, payload: Dict[str, Any], id: Optional[str] = None):
+        self.raw = raw
+        self.payload = payload
+        # stream entry id (StreamQueue only)
+        self.id = id
+
+    @property
+    def attempts(self) -> int:
+        return int(self.payload.get("attempts") or 0)
+
+
+def _decode(raw, id: Optional[str] = None) -> Optional[Job]:
+    try:
+        payload = json.loads(raw)
+    except Exception:
+        LOG.exception("Invalid JSON payload popped: %s", raw)
+        return None
+    if not isinstance(payload, dict):
+        LOG.error("Invalid payload popped: %s", raw)
+        return None
+    return Job(raw, payload, id)
+
+
+DeadHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class ListQueue:
+    """
+    Plain BLPOP queue: a job is gone from Redis once popped, so a worker
+    killed mid-chunk loses it. Failed jobs are pushed back to the tail.
+    Jobs out of attempts go to the dead list and are handed to on_dead,
+    which lets the worker settle the chunk's upload.
+    """
+    def __init__(self, r, key: str, max_attempts: int = 5, on_dead: Optional[DeadHandler] = None):
+        self.r = r
+        self.key = key
+        self.dead_key = f"{key}:dead"
+        self.max_attempts = max_attempts
+        self.on_dead = on_dead
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def _pop(self, timeout: int):
+        res = await self.r.blpop(self.key, timeout=timeout)
+        return res[1] if res else None
+
+    async def fetch(self, timeout: int = 5) -> Optional[Job]:
+        try:
+            raw = await self._pop(timeout)
+        except (asyncio.CancelledError, GeneratorExit):
+            raise
+        except Exception as e:
+            LOG.error("Redis pop from %s failed: %s — attempting reconnect", self.key, e)
+            await asyncio.sleep(0.2)
+            return None
+        if raw is None:
+            return None
+        job = _decode(raw)
+        if job is None:
+            await self.ack_raw(raw)
+        return job
+
+    async def ack_raw(self, raw) -> None:
+        pass
+
+    async def ack(self, job: Job) -> None:
+        await self.ack_raw(job.raw)
+
+    def _next_attempt(self, job: Job):
+        payload = dict(job.payload, attempts=job.attempts + 1)
+        if payload["attempts"] >= self.max_attempts:
+            LOG.error("Job for upload=%s failed %d times, moving to %s",
+                      payload.get("upload_id"), payload["attempts"], self.dead_key)
+            return self.dead_key, json.dumps(payload)
+        return self.key, json.dumps(payload)
+
+    async def _dead(self, payload: Dict[str, Any]) -> None:
+        if self.on_dead is None:
+            return
+        try:
+            await self.on_dead(payload)
+        except Exception:
+            LOG.exception("Dead-letter handler failed for upload=%s", payload.get("upload_id"))
+
+    async def retry(self, job: Job) -> None:
+        target, raw = self._next_attempt(job)
+        await self.r.rpush(target, raw)
+        if target == self.dead_key:
+            await self._dead(json.loads(raw))
+            return
+        LOG.info("Requeued payload for upload=%s", job.payload.get("upload_id"))
+
+
+class ReliableQueue(ListQueue):
+    """
+    BLMOVE each job into a per-worker processing list and keep a heartbeat
+    key alive while the worker runs. A reaper on every worker moves jobs
+    out of processing lists whose heartbeat expired back onto the queue,
+    so a machine destroyed mid-chunk does not lose the chunk.
+    """
+    def __init__(
+        self,
+        r,
+        key: str,
+        worker_id: str,
+        heartbeat_ttl: float = 30.0,
+        heartbeat_interval: float = 10.0,
+        reap_interval: float = 15.0,
+        max_attempts: int = 5,
+        on_dead: Optional[DeadHandler] = None,
+    ):
+        super().__init__(r, key, max_attempts=max_attempts, on_dead=on_dead)
+        self.worker_id = worker_id
+        self.processing_key = f"{key}:processing:{worker_id}"
+        self.heartbeat_key = f"{key}:heartbeat:{worker_id}"
+        self.heartbeat_ttl = heartbeat_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.reap_interval = reap_interval
+        self._reap_script = r.register_script(_REAP_SCRIPT)
+        self._tasks = []
+
+    async def start(self) -> None:
+        await self._beat()
+        # our own leftovers (e.g. after a crash-restart with the same id)
+        await self._requeue(self.processing_key, crashed=True)
+        self._tasks = [
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._reaper_loop()),
+        ]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # hand unfinished work back right away instead of waiting for the reaper
+        try:
+            await self._requeue(self.processing_key)
+            await self.r.delete(self.heartbeat_key)
+        except Exception as e:
+            LOG.error("Failed to release processing list %s: %s", self.processing_key, e)
+
+    async def _beat(self) -> None:
+        await self.r.set(self.heartbeat_key, "1", px=int(self.heartbeat_ttl * 1000))
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self._beat()
+            except Exception as e:
+                LOG.warning("Heartbeat failed: %s", e)
+
+    async def _requeue(self, processing_key: str, crashed: bool = False) -> int:
+        """
+        Move a processing list back onto the queue. Jobs left behind by a
+        crash count as an attempt; a graceful stop hands them back as-is.
+        """
+        moved = 0
+        if not crashed:
+            # LMOVE is atomic per item, so concurrent reapers never duplicate a job
+            while await self.r.lmove(processing_key, self.key, "RIGHT", "LEFT") is not None:
+                moved += 1
+            return moved
+        while True:
+            res = await self._reap_script(
+                keys=[processing_key, self.key, self.dead_key], args=[self.max_attempts]
+            )
+            if res is None:
+                return moved
+            if isinstance(res, (list, tuple)):
+                LOG.error("Reaped job from %s used up %d attempts, moved to %s",
+                          processing_key, self.max_attempts, self.dead_key)
+                await self._dead(json.loads(res[1]))
+            moved += 1
+
+    async def reap(self) -> int:
+        prefix = f"{self.key}:processing:"
+        moved = 0
+        async for processing_key in self.r.scan_iter(match=f"{prefix}*"):
+            if isinstance(processing_key, bytes):
+                processing_key = processing_key.decode()
+            worker_id = processing_key[len(prefix):]
+            if worker_id == self.worker_id:
+                continue
+            if await self.r.exists(f"{self.key}:heartbeat:{worker_id}"):
+                continue
+            n = await self._requeue(processing_key, crashed=True)
+            if n:
+                LOG.warning("Reaped %d job(s) from dead worker %s", n, worker_id)
+            moved += n
+        return moved
+
+    async def _reaper_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                await self.reap()
+            except Exception as e:
+                LOG.warning("Reaper failed: %s", e)
+
+    async def _pop(self, timeout: int):
+        return await self.r.blmove(self.key, self.processing_key, timeout, "LEFT", "RIGHT")
+
+    async def ack_raw(self, raw) -> None:
+        await self.r.lrem(self.processing_key, 1, raw)
+
+    async def retry(self, job: Job) -> None:
+        target, raw = self._next_attempt(job)
+        pipe = self.r.pipeline(transaction=True)
+        pipe.lrem(self.processing_key, 1, job.raw)
+        pipe.rpush(target, raw)
+        await pipe.execute()
+        if target == self.dead_key:
+            await self._dead(json.loads(raw))
+            return
+        LOG.info("Requeued payload for upload=%s", job.payload.get("upload_id"))
+
+
+class StreamQueue(ListQueue):
+    """
+    Redis Streams consumer-group backend: XREADGROUP to fetch, XACK (+XDEL)
+    per message, and XAUTOCLAIM to take over entries left pending by dead
+    consumers. Live consumers XCLAIM their own in-flight entries on every
+    heartbeat so long chunks are not stolen. Each takeover counts as an
+    attempt (from the XPENDING delivery count), so an entry that keeps
+    killing its consumer ends up on the dead list.
+    """
+    def __init__(
+        self,
+        r,
+        key: str,
+        group: str,
+        consumer: str,
+        dead_key: str,
+        claim_idle: float = 30.0,
+        heartbeat_interval: float = 10.0,
+        reap_interval: float = 15.0,
+        max_attempts: int = 5,
+        on_dead: Optional[DeadHandler] = None,
+    ):
+        super().__init__(r, key, max_attempts=max_attempts, on_dead=on_dead)
+        self.dead_key = dead_key
+        self.group = group
+        self.consumer = consumer
+        self.claim_idle_ms = int(claim_idle * 1000)
+        self.heartbeat_interval = heartbeat_interval
+        self.reap_interval = reap_interval
+        self._inflight = set()
+        self._claimed = deque()
+        self._tasks = []
+
+    async def start(self) -> None:
+        try:
+            await self.r.xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._tasks = [
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._reaper_loop()),
+        ]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            ids = list(self._inflight) + [e[0] for e in self._claimed]
+            if not ids:
+                continue
+            try:
+                # re-claiming our own entries resets their idle time
+                await self.r.xclaim(self.key, self.group, self.consumer, 0, ids, justid=True)
+            except Exception as e:
+                LOG.warning("Stream heartbeat failed: %s", e)
+
+    async def _deliveries(self, entry_ids) -> list:
+        pipe = self.r.pipeline(transaction=False)
+        for entry_id in entry_ids:
+            pipe.xpending_range(self.key, self.group, entry_id, entry_id, 1)
+        out = []
+        for res in await pipe.execute():
+            out.append(int(res[0]["times_delivered"]) if res else 1)
+        return out
+
+    async def reap(self) -> int:
+        claimed = 0
+        start = "0-0"
+        while True:
+            res = await self.r.xautoclaim(
+                self.key, self.group, self.consumer, self.claim_idle_ms, start_id=start, count=100
+            )
+            start, entries = res[0], res[1]
+            entries = [
+                (entry_id, fields) for entry_id, fields in entries
+                if entry_id not in self._inflight
+                and not any(e[0] == entry_id for e in self._claimed)
+            ]
+            if entries:
+                # the first delivery is the original read; every later one
+                # is a takeover from a consumer that died holding the entry
+                deliveries = await self._deliveries([e[0] for e in entries])
+                for (entry_id, fields), n in zip(entries, deliveries):
+                    self._claimed.append((entry_id, fields, max(0, n - 1)))
+                    claimed += 1
+            if start in ("0-0", b"0-0"):
+                break
+        if claimed:
+            LOG.warning("Claimed %d stale stream entr(ies) from dead consumers", claimed)
+        return claimed
+
+    async def _reaper_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                await self.reap()
+            except Exception as e:
+                LOG.warning("Stream reaper failed: %s", e)
+
+    async def fetch(self, timeout: int = 5) -> Optional[Job]:
+        takeovers = 0
+        if self._claimed:
+            entry_id, fields, takeovers = self._claimed.popleft()
+        else:
+            try:
+                res = await self.r.xreadgroup(
+                    self.group, self.consumer, {self.key: ">"}, count=1, block=timeout * 1000
+                )
+            except (asyncio.CancelledError, GeneratorExit):
+                raise
+            except Exception as e:
+                LOG.error("Redis XREADGROUP on %s failed: %s", self.key, e)
+                await asyncio.sleep(0.2)
+                return None
+            if not res:
+                return None
+            entry_id, fields = res[0][1][0]
+        job = _decode(fields.get("payload"), entry_id)
+        if job is None:
+            await self.r.xack(self.key, self.group, entry_id)
+            await self.r.xdel(self.key, entry_id)
+            return None
+        if takeovers:
+            job.payload["attempts"] = job.attempts + takeovers
+            if job.attempts >= self.max_attempts:
+                LOG.error("Job for upload=%s failed %d times, moving to %s",
+                          job.payload.get("upload_id"), job.attempts, self.dead_key)
+                pipe = self.r.pipeline(transaction=True)
+                pipe.xack(self.key, self.group, entry_id)
+                pipe.xdel(self.key, entry_id)
+                pipe.rpush(self.dead_key, json.dumps(job.payload))
+                await pipe.execute()
+                await self._dead(job.payload)
+                return None
+        self._inflight.add(entry_id)
+        return job
+
+    async def ack(self, job: Job) -> None:
+        pipe = self.r.pipeline(transaction=False)
+        pipe.xack(self.key, self.group, job.id)
+        pipe.xdel(self.key, job.id)
+        await pipe.execute()
+        self._inflight.discard(job.id)
+
+    async def retry(self, job: Job) -> None:
+        target, raw = self._next_attempt(job)
+        pipe = self.r.pipeline(transaction=True)
+        pipe.xack(self.key, self.group, job.id)
+        pipe.xdel(self.key, job.id)
+        if target == self.dead_key:
+            pipe.rpush(target, raw)
+        else:
+            pipe.xadd(self.key, {"payload": raw})
+        await pipe.execute()
+        self._inflight.discard(job.id)
+        if target == self.dead_key:
+            await self._dead(json.loads(raw))
+            return
+        LOG.info("Requeued payload for upload=%s", job.payload.get("upload_id"))
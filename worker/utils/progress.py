@@ -0,0 +1,139 @@
+# worker/utils/progress.py
+import asyncio
+import json
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+LOG = logging.getLogger("mailscout-worker")
+
+STATUS_FIELDS = ("valid", "risky", "invalid")
+
+
+class _Pending:
+    __slots__ = ("processed", "statuses", "total", "status")
+
+    def __init__(self):
+        self.processed = 0
+        self.statuses: Counter = Counter()
+        self.total: Optional[int] = None
+        self.status: Optional[str] = None
+
+
+class ProgressReporter:
+    """
+    Per-upload progress in a Redis hash ({prefix}:{upload_id}), shared by
+    every worker on the upload. record() only accumulates in memory; a
+    background loop flushes the deltas every interval seconds with HINCRBY
+    in one pipeline, refreshes rate/eta, and PUBLISHes the resulting
+    snapshot on {channel_prefix}:{upload_id} for SSE watchers.
+    """
+    def __init__(
+        self,
+        prefix: str = "progress",
+        channel_prefix: str = "mailscout:progress",
+        interval: float = 0.25,
+        ttl_seconds: int = 86400,
+    ):
+        self._prefix = prefix
+        self._channel_prefix = channel_prefix
+        self._interval = interval
+        self._ttl = ttl_seconds
+        self._pending: Dict[str, _Pending] = {}
+        self._r = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _key(self, upload_id: str) -> str:
+        return f"{self._prefix}:{upload_id}"
+
+    def record(
+        self,
+        upload_id: str,
+        statuses: Counter,
+        total: Optional[int] = None,
+        status: Optional[str] = None,
+    ) -> None:
+        """Account newly written results; call after they are committed."""
+        p = self._pending.get(upload_id)
+        if p is None:
+            p = self._pending[upload_id] = _Pending()
+        p.processed += sum(statuses.values())
+        p.statuses.update(statuses)
+        if total is not None:
+            p.total = total
+        if status is not None:
+            p.status = status
+
+    async def start(self, r) -> None:
+        self._r = r
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            LOG.debug("Final progress flush failed: %s", e)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                LOG.debug("Redis progress flush failed: %s", e)
+
+    async def flush(self) -> None:
+        if not self._pending or self._r is None:
+            return
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        try:
+            pipe = self._r.pipeline(transaction=False)
+            for upload_id, p in pending.items():
+                key = self._key(upload_id)
+                pipe.hsetnx(key, "started_at", now)
+                pipe.hincrby(key, "processed", p.processed)
+                for name in STATUS_FIELDS:
+                    pipe.hincrby(key, name, p.statuses[name])
+                pipe.hmget(key, "started_at", "total")
+            res = await pipe.execute()
+        except Exception:
+            # put the deltas back so the next tick retries them
+            for upload_id, p in pending.items():
+                self.record(upload_id, p.statuses, total=p.total, status=p.status)
+            raise
+
+        per_upload = 2 + len(STATUS_FIELDS) + 1
+        pipe = self._r.pipeline(transaction=False)
+        for i, (upload_id, p) in enumerate(pending.items()):
+            out = res[i * per_upload:(i + 1) * per_upload]
+            processed = int(out[1])
+            started_at, stored_total = out[-1]
+            total = p.total if p.total is not None else (int(stored_total) if stored_total else None)
+            elapsed = now - float(started_at or now)
+            # emails/second since the first flush; too noisy before 1s
+            rate = processed / elapsed if elapsed >= 1.0 else None
+            snapshot: Dict[str, Any] = {
+                "processed": processed,
+                "rate": round(rate, 2) if rate else None,
+            }
+            for j, name in enumerate(STATUS_FIELDS):
+                snapshot[name] = int(out[2 + j])
+            if total is not None:
+                snapshot["total"] = total
+                snapshot["eta"] = round(max(total - processed, 0) / rate, 1) if rate else None
+            if p.status is not None:
+                snapshot["status"] = p.status
+
+            key = self._key(upload_id)
+            fields = {k: v for k, v in snapshot.items() if k not in STATUS_FIELDS and k != "processed"}
+            fields["updated_at"] = now
+            pipe.hset(key, mapping={k: ("" if v is None else v) for k, v in fields.items()})
+            pipe.expire(key, self._ttl)
+            pipe.publish(f"{self._channel_prefix}:{upload_id}", json.dumps(snapshot))
+        await pipe.execute()
@@ -0,0 +1,164 @@
+# worker/utils/result_writer.py
+import asyncio
+import json
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models.email_result import EmailResult
+
+LOG = logging.getLogger("mailscout-worker")
+
+RESULT_COLUMNS = ("upload_id", "email", "normalized", "status", "score", "checks", "created_at")
+
+# Session-local staging table for the COPY path; rows are cleared after
+# every batch and again at commit.
+_STAGE_DDL = text(
+    """
+    CREATE TEMP TABLE IF NOT EXISTS email_results_stage (
+        upload_id text,
+        email text,
+        normalized text,
+        status text,
+        score integer,
+        checks json,
+        created_at timestamptz
+    ) ON COMMIT DELETE ROWS
+    """
+)
+_STAGE_MERGE = text(
+    """
+    INSERT INTO email_results (upload_id, email, normalized, status, score, checks, created_at)
+    SELECT upload_id, email, normalized, status, score, checks, created_at
+    FROM email_results_stage
+    ON CONFLICT (upload_id, normalized) DO NOTHING
+    RETURNING status
+    """
+)
+
+
+async def _insert_values(db, rows: List[Dict[str, Any]]) -> Counter:
+    stmt = (
+        pg_insert(EmailResult)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["upload_id", "normalized"])
+        .returning(EmailResult.status)
+    )
+    res = await db.execute(stmt)
+    return Counter(row[0] for row in res)
+
+
+async def _insert_copy(db, rows: List[Dict[str, Any]]) -> Counter:
+    conn = await db.connection()
+    await conn.execute(_STAGE_DDL)
+    raw = await conn.get_raw_connection()
+    now = datetime.now(timezone.utc)
+    records = [
+        (
+            r["upload_id"],
+            r["email"],
+            r["normalized"],
+            r["status"],
+            r["score"],
+            json.dumps(r["checks"]),
+            now,
+        )
+        for r in rows
+    ]
+    await raw.driver_connection.copy_records_to_table(
+        "email_results_stage", records=records, columns=RESULT_COLUMNS
+    )
+    res = await conn.execute(_STAGE_MERGE)
+    inserted = Counter(row[0] for row in res)
+    await conn.execute(text("TRUNCATE email_results_stage"))
+    return inserted
+
+
+async def write_results(db, rows: List[Dict[str, Any]], copy_threshold: int = 500) -> Counter:
+    """
+    Idempotently insert result rows; duplicates of (upload_id, normalized)
+    are skipped. Batches of copy_threshold rows or more go through COPY into
+    a temp table. Runs in the caller's transaction; returns a Counter of the
+    inserted rows by status.
+    """
+    if not rows:
+        return Counter()
+    if len(rows) >= copy_threshold:
+        return await _insert_copy(db, rows)
+    return await _insert_values(db, rows)
+
+
+class ResultBuffer:
+    """
+    Bounded write-behind buffer for one chunk's result rows. Rows are handed
+    to flush_fn every batch_size rows or every flush_interval seconds,
+    whichever comes first, so finished rows are persisted while slow probes
+    are still running. Flushes are serialized and add() waits on a running
+    flush, which caps the buffer at about two batches. A failed flush is
+    re-raised to the producer on its next add() or on exit.
+    """
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Dict[str, Any]]], Awaitable[int]],
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+    ):
+        self._flush_fn = flush_fn
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = flush_interval
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = asyncio.Lock()
+        self._error: Optional[BaseException] = None
+        self._ticker: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.written = 0
+
+    async def __aenter__(self) -> "ResultBuffer":
+        if self._flush_interval > 0:
+            self._ticker = asyncio.create_task(self._tick())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._ticker is not None:
+            self._ticker.cancel()
+            await asyncio.gather(self._ticker, return_exceptions=True)
+            self._ticker = None
+        if exc_type is None:
+            await self.flush()
+
+    async def add(self, row: Dict[str, Any]) -> None:
+        if self._error is not None:
+            raise self._error
+        self._rows.append(row)
+        if len(self._rows) >= self._batch_size:
+            await self.flush()
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if self._error is not None:
+                raise self._error
+            rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                n = await self._flush_fn(rows)
+            except Exception as e:
+                self._error = e
+                raise
+            self.flushes += 1
+            self.written += n
+            return n
+
+    async def _tick(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                # surfaced to the producer by the next add() / exit
+                LOG.exception("Timed result flush failed")
+                return
@@ -3,22 +3,36 @@
 from .syntax_engine import (
     normalize_email,
     is_syntax_valid,
+    prepare_batch,
+    ParsedEmail,
 )
 
 from .disposable import is_disposable
-from .dns_engine import resolve_mx_for_domain
-from .smtp_engine import smtp_check_rcpt
-from .catchall_checker import is_catch_all
-from .provider_profiles import identify_provider
+from .dns_engine import resolve_mx_for_domain, mx_cache, dns_latency
+from .smtp_engine import smtp_check_rcpt, smtp_pool, smtp_latency, smtp_rcpt_latency
+from .catchall_checker import is_catch_all, catch_all_verdict
+from .mx_governor import mx_governor
+from .provider_profiles import identify_provider, provider_for_mx, provider_policy
 from .score_engine import compute_score_and_status
 
 __all__ = [
     "normalize_email",
     "is_syntax_valid",
+    "prepare_batch",
+    "ParsedEmail",
     "is_disposable",
     "resolve_mx_for_domain",
+    "mx_cache",
+    "dns_latency",
     "smtp_check_rcpt",
+    "smtp_pool",
+    "smtp_latency",
+    "smtp_rcpt_latency",
     "is_catch_all",
+    "catch_all_verdict",
+    "mx_governor",
     "identify_provider",
+    "provider_for_mx",
+    "provider_policy",
     "compute_score_and_status",
 ]
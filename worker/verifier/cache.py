@@ -0,0 +1,86 @@
+# worker/verifier/cache.py
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# a resolver returns (value, ttl_seconds); ttl None means "do not cache"
+Resolver = Callable[[], Awaitable[Tuple[Any, Optional[float]]]]
+
+
+class AsyncTTLCache:
+    """
+    Bounded LRU cache with per-entry TTL and single-flight resolution.
+    Concurrent lookups of the same key share one in-flight resolver call,
+    so 500 simultaneous misses on gmail.com produce exactly one query.
+    """
+    def __init__(self, maxsize: int = 10000):
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expiry, value = entry
+        if expiry < time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    async def _resolve(self, key: Hashable, resolver: Resolver) -> Any:
+        try:
+            value, ttl = await resolver()
+        finally:
+            self._inflight.pop(key, None)
+        if ttl:
+            self.set(key, value, ttl)
+        return value
+
+    async def get_or_resolve(self, key: Hashable, resolver: Resolver) -> Any:
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # the resolver runs in its own task and every caller shields it,
+            # so cancelling one caller never cancels the others' lookup
+            task = asyncio.ensure_future(self._resolve(key, resolver))
+            self._inflight[key] = task
+            # retrieve so a lookup nobody awaits any more does not log
+            # "exception never retrieved"
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
@@ -1,12 +1,23 @@
 # worker/verifier/catchall_checker.py
+import os
 import random
 import string
 import asyncio
-from typing import List
+from typing import Optional, Tuple
+from .cache import AsyncTTLCache
 from .dns_engine import resolve_mx_for_domain
 from .smtp_engine import smtp_check_rcpt
 
-async def is_catch_all(domain: str, mail_from: str = "verify@localhost") -> bool:
+# Verdicts are memoized per domain. Definite answers live CATCHALL_TTL;
+# "unknown" (timeouts, 4xx, blocked probes) lives CATCHALL_UNKNOWN_TTL and
+# is then probed again instead of on every address.
+CATCHALL_TTL = float(os.getenv("CATCHALL_TTL", "21600"))
+CATCHALL_UNKNOWN_TTL = float(os.getenv("CATCHALL_UNKNOWN_TTL", "300"))
+
+catchall_cache = AsyncTTLCache(maxsize=int(os.getenv("CATCHALL_CACHE_SIZE", "10000")))
+
+
+async def _probe_catch_all(domain: str, mail_from: str) -> Optional[bool]:
     """
     Detect catch-all behavior using one random address + a known good address pattern.
     Strategy:
@@ -14,11 +25,10 @@ async def is_catch_all(domain: str, mail_from: str = "verify@localhost") -> bool
       - pick top MX host(s)
       - try RCPT TO for a clearly-random address
       - if server accepts random -> likely catch-all
+      - if server rejects it with 5xx -> not catch-all
+      - anything else -> unknown (None)
     This is heuristic and must be conservative.
     """
-    if not domain:
-        return False
-
     mxs = await resolve_mx_for_domain(domain)
     if not mxs:
         return False
@@ -27,13 +37,36 @@ async def is_catch_all(domain: str, mail_from: str = "verify@localhost") -> bool
     rand_local = ''.join(random.choices(string.ascii_lowercase + string.digits, k=16))
     test_addr = f"{rand_local}@{domain}"
 
-    # probe up to first 2 MX hosts with short timeouts
+    # probe up to first 2 MX hosts; timeouts adapt to each host's latency
+    # and hosts with an open circuit breaker are skipped immediately
     for mx in mxs[:2]:
         try:
-            accepted, _ = await smtp_check_rcpt(mx, test_addr, mail_from=mail_from, timeout=6.0)
-            if accepted:
-                # if random accepted — treat as catch-all (conservative)
-                return True
+            accepted, reason = await smtp_check_rcpt(mx, test_addr, mail_from=mail_from)
         except Exception:
             continue
-    return False
+        if accepted:
+            # if random accepted — treat as catch-all (conservative)
+            return True
+        if str(reason or "")[:1] == "5":
+            return False
+    return None
+
+
+async def catch_all_verdict(domain: str, mail_from: str = "verify@localhost") -> Optional[bool]:
+    """
+    Memoized catch-all verdict: True / False, or None when unknown.
+    Concurrent callers for the same domain share one in-flight probe.
+    """
+    if not domain:
+        return False
+    domain = domain.lower().rstrip(".")
+
+    async def resolve() -> Tuple[Optional[bool], float]:
+        verdict = await _probe_catch_all(domain, mail_from)
+        return verdict, (CATCHALL_UNKNOWN_TTL if verdict is None else CATCHALL_TTL)
+
+    return await catchall_cache.get_or_resolve(domain, resolve)
+
+
+async def is_catch_all(domain: str, mail_from: str = "verify@localhost") -> bool:
+    return bool(await catch_all_verdict(domain, mail_from=mail_from))
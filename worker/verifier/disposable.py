@@ -1,11 +1,240 @@
 # worker/verifier/disposable.py
-# Minimal disposable provider list (extendable dynamic list recommended)
+# Disposable-domain lookup. With DISPOSABLE_DOMAINS_FILE set, the list (one
+# domain per line, "#" comments, "*.example.com" for any subdomain) is
+# compiled into a sorted index of reversed-label keys next to it and mmap'd
+# read-only, so every worker process on a machine shares one copy through
+# the page cache. A plain entry also covers its subdomains. The source is
+# re-checked at most every DISPOSABLE_RELOAD_INTERVAL seconds; when it
+# changed, the index is rebuilt in a background thread and swapped in.
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+LOG = logging.getLogger("mailscout-worker")
+
+# Built-in fallback when no list file is configured
 DISPOSABLE_PROVIDERS = {
     "mailinator.com", "10minutemail.com", "tempmail.com", "trashmail.com",
     "guerrillamail.com", "yopmail.com", "dispostable.com",
 }
 
+DISPOSABLE_DOMAINS_FILE = os.getenv("DISPOSABLE_DOMAINS_FILE", "")
+DISPOSABLE_INDEX_FILE = os.getenv("DISPOSABLE_INDEX_FILE", "")
+DISPOSABLE_RELOAD_INTERVAL = float(os.getenv("DISPOSABLE_RELOAD_INTERVAL", "30"))
+
+# Index layout: magic, uint32 count, the source's mtime_ns and size it was
+# built from, (count + 1) uint32 offsets into the key blob, then the keys
+# themselves in byte order.
+_MAGIC = b"MSDISP2\0"
+_HEADER = struct.Struct("<8sIqq")
+_OFFSET = struct.Struct("<I")
+
+
+def _source_stamp(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _reverse_key(domain: str) -> Optional[bytes]:
+    """"a.mailinator.com" -> b"com.mailinator.a"; "*.x.com" -> b"com.x.*"."""
+    domain = domain.strip().lower().rstrip(".")
+    if not domain or " " in domain:
+        return None
+    try:
+        domain = domain.encode("idna").decode("ascii") if not domain.isascii() else domain
+    except UnicodeError:
+        # idna rejects "*"; only the wildcard prefix is allowed to be special
+        if not domain.startswith("*."):
+            return None
+        try:
+            domain = "*." + domain[2:].encode("idna").decode("ascii")
+        except UnicodeError:
+            return None
+    return ".".join(reversed(domain.split("."))).encode("ascii")
+
+
+def _read_entries(path: str) -> Iterable[str]:
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                yield line
+
+
+def compile_index(source: str, index_path: str, extra: Iterable[str] = ()) -> int:
+    """Build the binary index from a domain list; written atomically. Returns entry count."""
+    # stamp before reading: a change during the build shows up as stale next time
+    mtime_ns, size = _source_stamp(source)
+    keys = set()
+    for entry in list(_read_entries(source)) + list(extra):
+        key = _reverse_key(entry)
+        if key:
+            keys.add(key)
+    ordered = sorted(keys)
+
+    offsets = [0]
+    for key in ordered:
+        offsets.append(offsets[-1] + len(key))
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(index_path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(ordered), mtime_ns, size))
+            f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+            f.write(b"".join(ordered))
+        # readers that already mapped the old file keep their mapping
+        os.replace(tmp, index_path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return len(ordered)
+
+
+class _View(NamedTuple):
+    mm: mmap.mmap
+    count: int
+    blob: int
+    stamp: Tuple[int, int]
+
+
+def _open_index(index_path: str) -> Optional[_View]:
+    try:
+        f = open(index_path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mm) < _HEADER.size:
+        mm.close()
+        return None
+    magic, count, mtime_ns, size = _HEADER.unpack_from(mm, 0)
+    if magic != _MAGIC:
+        mm.close()
+        return None
+    return _View(mm, count, _HEADER.size + (count + 1) * _OFFSET.size, (mtime_ns, size))
+
+
+def _has(view: _View, key: bytes) -> bool:
+    mm, blob = view.mm, view.blob
+    lo, hi = 0, view.count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        start, end = struct.unpack_from("<II", mm, _HEADER.size + mid * _OFFSET.size)
+        k = mm[blob + start:blob + end]
+        if k < key:
+            lo = mid + 1
+        elif k > key:
+            hi = mid
+        else:
+            return True
+    return False
+
+
+def _suffix_keys(domain: str) -> List[bytes]:
+    """
+    Keys to look up for domain: the domain and each parent as exact keys
+    (plain entries cover subdomains), plus "*.parent" wildcard keys.
+    """
+    labels = list(reversed(domain.lower().rstrip(".").split(".")))
+    keys = []
+    for n in range(len(labels), 1, -1):
+        keys.append(".".join(labels[:n]).encode("ascii", "ignore"))
+    for n in range(len(labels) - 1, 0, -1):
+        keys.append((".".join(labels[:n]) + ".*").encode("ascii", "ignore"))
+    return keys
+
+
+class DisposableIndex:
+    """
+    Binary search over an mmap'd, compiled disposable-domain index. The
+    index is rebuilt off the event loop: lookups keep using the current
+    mapping until a background thread swaps the new one in.
+    """
+
+    def __init__(self, source: str, index_path: str = "", reload_interval: float = 30.0):
+        self.source = source
+        self.index_path = index_path or f"{source}.idx"
+        self.reload_interval = reload_interval
+        self._view: Optional[_View] = None
+        self._checked_at = 0.0
+        self._reloading = False
+        self._load()
+
+    def __len__(self) -> int:
+        view = self._view
+        return view.count if view is not None else 0
+
+    def _load(self) -> None:
+        stamp = _source_stamp(self.source)
+        view = _open_index(self.index_path)
+        if view is None or view.stamp != stamp:
+            n = compile_index(self.source, self.index_path, extra=DISPOSABLE_PROVIDERS)
+            LOG.info("Compiled disposable index %s (%d entries)", self.index_path, n)
+            view = _open_index(self.index_path)
+            if view is None:
+                raise ValueError(f"{self.index_path} is not a disposable index")
+        # one reference swap; the old mapping is released once no lookup
+        # holds it any more
+        self._view = view
+        self._checked_at = time.monotonic()
+
+    def _reload(self) -> None:
+        try:
+            self._load()
+        except Exception as e:
+            # keep serving the current index
+            LOG.warning("Disposable index reload failed: %s", e)
+        finally:
+            self._reloading = False
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if self._reloading or now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            changed = _source_stamp(self.source) != self._view.stamp
+        except Exception as e:
+            LOG.warning("Disposable list %s unreadable: %s", self.source, e)
+            return
+        if changed:
+            self._reloading = True
+            threading.Thread(target=self._reload, name="disposable-reload", daemon=True).start()
+
+    def contains(self, domain: str) -> bool:
+        self._maybe_reload()
+        view = self._view
+        return any(_has(view, key) for key in _suffix_keys(domain))
+
+
+_index: Optional[DisposableIndex] = None
+if DISPOSABLE_DOMAINS_FILE:
+    try:
+        _index = DisposableIndex(
+            DISPOSABLE_DOMAINS_FILE,
+            index_path=DISPOSABLE_INDEX_FILE,
+            reload_interval=DISPOSABLE_RELOAD_INTERVAL,
+        )
+        LOG.info("Disposable index loaded: %d entries", len(_index))
+    except Exception as e:
+        LOG.error("Failed to load disposable list %s, using built-in list: %s",
+                  DISPOSABLE_DOMAINS_FILE, e)
+        _index = None
+
+
 def is_disposable(domain: str) -> bool:
     if not domain:
         return False
-    return domain.lower() in DISPOSABLE_PROVIDERS
+    if _index is not None:
+        return _index.contains(domain)
+    # the domain or any parent: plain entries cover subdomains
+    labels = domain.lower().rstrip(".").split(".")
+    return any(".".join(labels[i:]) in DISPOSABLE_PROVIDERS for i in range(len(labels) - 1))
@@ -1,27 +1,80 @@
 # worker/verifier/dns_engine.py
 import aiodns
 import asyncio
-from typing import List
+import os
+import time
+from typing import List, Optional, Tuple
+
+from .cache import AsyncTTLCache
+from .latency import LatencyTracker
 
 # You may supply alternate resolvers by passing nameservers to aiodns.DNSResolver
 resolver = aiodns.DNSResolver()
 
-async def resolve_mx_for_domain(domain: str, timeout: float = 5.0) -> List[str]:
+# Positive answers are cached for the record TTL (clamped), NXDOMAIN and
+# empty answers for MX_NEGATIVE_TTL. Timeouts and SERVFAIL are not cached.
+MX_CACHE_SIZE = int(os.getenv("MX_CACHE_SIZE", "10000"))
+MX_MIN_TTL = float(os.getenv("MX_MIN_TTL", "60"))
+MX_MAX_TTL = float(os.getenv("MX_MAX_TTL", "3600"))
+MX_NEGATIVE_TTL = float(os.getenv("MX_NEGATIVE_TTL", "300"))
+
+mx_cache = AsyncTTLCache(maxsize=MX_CACHE_SIZE)
+
+# Resolver latency drives the query timeout. No circuit breaker here: a
+# timeout usually means one domain's nameservers are dead, not the resolver.
+dns_latency = LatencyTracker(
+    default_timeout=float(os.getenv("DNS_TIMEOUT", "5")),
+    min_timeout=float(os.getenv("DNS_MIN_TIMEOUT", "1")),
+    max_timeout=float(os.getenv("DNS_MAX_TIMEOUT", "5")),
+)
+RESOLVER_KEY = "resolver"
+
+_NEGATIVE_CODES = {aiodns.error.ARES_ENOTFOUND, aiodns.error.ARES_ENODATA}
+
+
+async def _query_mx(domain: str, timeout: float) -> Tuple[List[str], Optional[float]]:
     """
-    Return ordered list of mx hostnames (strings).
-    If none or error -> return [].
+    Query MX records. Returns (hosts, ttl) where ttl is None if the answer
+    must not be cached.
     """
-    if not domain:
-        return []
+    started = time.monotonic()
     try:
         fut = resolver.query(domain, "MX")
         records = await asyncio.wait_for(fut, timeout=timeout)
-        # records: list of objects with .priority and .host
-        mxs = sorted(((r.priority, r.host.rstrip(".")) for r in records), key=lambda x: x[0])
-        return [host for _, host in mxs]
-    except aiodns.error.DNSError:
-        return []
+    except aiodns.error.DNSError as e:
+        code = e.args[0] if e.args else None
+        if code in _NEGATIVE_CODES:
+            dns_latency.record_success(RESOLVER_KEY, time.monotonic() - started)
+            return [], MX_NEGATIVE_TTL
+        return [], None
     except asyncio.TimeoutError:
-        return []
+        dns_latency.record_failure(RESOLVER_KEY, elapsed=time.monotonic() - started)
+        return [], None
     except Exception:
+        return [], None
+    dns_latency.record_success(RESOLVER_KEY, time.monotonic() - started)
+
+    if not records:
+        return [], MX_NEGATIVE_TTL
+    # records: list of objects with .priority, .host and .ttl
+    mxs = sorted(((r.priority, r.host.rstrip(".")) for r in records), key=lambda x: x[0])
+    ttl = min((getattr(r, "ttl", 0) or 0 for r in records), default=0) or MX_MIN_TTL
+    ttl = max(MX_MIN_TTL, min(MX_MAX_TTL, float(ttl)))
+    return [host for _, host in mxs], ttl
+
+
+async def resolve_mx_for_domain(domain: str, timeout: Optional[float] = None) -> List[str]:
+    """
+    Return ordered list of mx hostnames (strings).
+    If none or error -> return [].
+    Answers are served from mx_cache; concurrent lookups share one query.
+    Without an explicit timeout it is derived from resolver latency.
+    """
+    if not domain:
         return []
+    domain = domain.lower().rstrip(".")
+    if timeout is None:
+        timeout = dns_latency.timeout(RESOLVER_KEY)
+    hosts = await mx_cache.get_or_resolve(domain, lambda: _query_mx(domain, timeout))
+    # callers may mutate the list; never hand out the cached object
+    return list(hosts)
@@ -0,0 +1,158 @@
+# worker/verifier/latency.py
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+LOG = logging.getLogger("mailscout-worker")
+
+
+class _Stats:
+    __slots__ = ("ewma", "samples", "p95", "failures", "open_until", "trial_until")
+
+    def __init__(self, window: int):
+        self.ewma: Optional[float] = None
+        self.samples = deque(maxlen=window)
+        self.p95: Optional[float] = None
+        self.failures = 0
+        self.open_until = 0.0
+        # half-open: end of the lease of the single trial call in flight
+        self.trial_until = 0.0
+
+
+class LatencyTracker:
+    """
+    Rolling latency per key (MX host, resolver): EWMA plus p95 over the last
+    `window` samples. timeout() derives an operation timeout from them once
+    `min_samples` are in, clamped to [min_timeout, max_timeout].
+
+    Timeouts are fed back as samples at the timeout value (censored), so a
+    host that slows down pushes its derived timeout up instead of tripping
+    on a limit learned from its fast days.
+
+    With failure_threshold > 0 it is also a circuit breaker: that many
+    consecutive failures open the key for `cooldown` seconds, during which
+    allow() is False and callers fail fast. After the cooldown the key is
+    half-open: allow() lets exactly one trial call through (others still
+    fail fast); its failure re-opens the key, its success closes it. A
+    trial that never reports back is given up after `trial_timeout`.
+    """
+    def __init__(
+        self,
+        default_timeout: float,
+        min_timeout: float,
+        max_timeout: float,
+        multiplier: float = 3.0,
+        alpha: float = 0.2,
+        window: int = 64,
+        min_samples: int = 5,
+        failure_threshold: int = 0,
+        cooldown: float = 300.0,
+        trial_timeout: Optional[float] = None,
+        max_keys: int = 10000,
+    ):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.multiplier = multiplier
+        self.alpha = alpha
+        self.window = window
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.trial_timeout = trial_timeout if trial_timeout is not None else 2 * max_timeout
+        self.max_keys = max_keys
+        self._stats: "OrderedDict[str, _Stats]" = OrderedDict()
+
+    def _get(self, key: str) -> _Stats:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = _Stats(self.window)
+            if len(self._stats) > self.max_keys:
+                self._stats.popitem(last=False)
+        else:
+            self._stats.move_to_end(key)
+        return stats
+
+    def timeout(self, key: str) -> float:
+        stats = self._stats.get(key)
+        if stats is None or len(stats.samples) < self.min_samples:
+            return self.default_timeout
+        # p95 covers the slow tail; the EWMA term reacts to a host slowing down
+        basis = max(stats.p95 or 0.0, stats.ewma or 0.0)
+        return max(self.min_timeout, min(self.max_timeout, basis * self.multiplier))
+
+    def is_open(self, key: str) -> bool:
+        """True while the key is cooling down after tripping the breaker."""
+        if self.failure_threshold <= 0:
+            return False
+        stats = self._stats.get(key)
+        return stats is not None and stats.open_until > time.monotonic()
+
+    def allow(self, key: str) -> bool:
+        """
+        Whether a call to key may proceed now. In the half-open state this
+        hands out the single trial slot, so call it right before the call.
+        """
+        if self.failure_threshold <= 0:
+            return True
+        stats = self._stats.get(key)
+        if stats is None or stats.failures < self.failure_threshold:
+            return True
+        now = time.monotonic()
+        if stats.open_until > now or stats.trial_until > now:
+            return False
+        stats.trial_until = now + self.trial_timeout
+        return True
+
+    def _add_sample(self, stats: _Stats, elapsed: float) -> None:
+        stats.ewma = elapsed if stats.ewma is None else (
+            self.alpha * elapsed + (1 - self.alpha) * stats.ewma
+        )
+        stats.samples.append(elapsed)
+        ordered = sorted(stats.samples)
+        stats.p95 = ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def record_success(self, key: str, elapsed: Optional[float] = None) -> None:
+        """A completed call; without elapsed it only resets the breaker."""
+        stats = self._get(key)
+        if elapsed is not None:
+            self._add_sample(stats, elapsed)
+        stats.failures = 0
+        stats.open_until = 0.0
+        stats.trial_until = 0.0
+
+    def record_failure(self, key: str, elapsed: Optional[float] = None) -> None:
+        """
+        A timeout or connection failure. Pass elapsed for timeouts (the
+        timeout value, a lower bound of the real latency) so it feeds the
+        stats; fast failures such as a refused connection should not.
+        """
+        stats = self._get(key)
+        if elapsed is not None:
+            self._add_sample(stats, elapsed)
+        stats.failures += 1
+        stats.trial_until = 0.0
+        if self.failure_threshold > 0 and stats.failures >= self.failure_threshold:
+            stats.open_until = time.monotonic() + self.cooldown
+            LOG.warning("Circuit open for %s after %d failures (cooldown %.0fs)",
+                        key, stats.failures, self.cooldown)
+
+    def snapshot(self, key: str) -> Dict[str, Optional[float]]:
+        stats = self._stats.get(key)
+        if stats is None:
+            return {"ewma": None, "p95": None, "timeout": self.default_timeout, "open": False}
+        return {
+            "ewma": stats.ewma,
+            "p95": stats.p95,
+            "timeout": self.timeout(key),
+            "open": self.is_open(key),
+        }
+
+    def stats(self) -> Dict[str, int]:
+        now = time.monotonic()
+        return {
+            "keys": len(self._stats),
+            "open": sum(1 for s in self._stats.values() if s.open_until > now),
+        }
@@ -0,0 +1,123 @@
+# worker/verifier/mx_governor.py
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, NamedTuple, Optional
+from .provider_profiles import provider_for_mx
+
+
+class MXLimits(NamedTuple):
+    per_host: int       # concurrent probes per MX host
+    rate: float         # probes per second per MX host (token refill)
+    burst: int          # token bucket size
+    family: int         # concurrent probes across all hosts of the family
+
+
+PER_MX_LIMIT = int(os.getenv("PER_MX_LIMIT", "5"))
+MX_RATE = float(os.getenv("MX_RATE", "5"))
+MX_CONCURRENCY = int(os.getenv("MX_CONCURRENCY", "6"))
+SMTP_CONCURRENCY = int(os.getenv("SMTP_CONCURRENCY", "25"))
+
+# Large providers run one fleet behind many MX names (every Microsoft 365
+# tenant has its own *.mail.protection.outlook.com host), so they also get a
+# family-wide cap. Unknown hosts are independent and only limited per host.
+FAMILY_LIMITS: Dict[str, MXLimits] = {
+    "google": MXLimits(per_host=10, rate=10.0, burst=20, family=MX_CONCURRENCY * 4),
+    "microsoft": MXLimits(per_host=3, rate=2.0, burst=4, family=MX_CONCURRENCY),
+    "yahoo": MXLimits(per_host=2, rate=1.0, burst=2, family=max(1, MX_CONCURRENCY // 2)),
+    "apple": MXLimits(per_host=2, rate=1.0, burst=2, family=max(1, MX_CONCURRENCY // 2)),
+    "default": MXLimits(per_host=PER_MX_LIMIT, rate=MX_RATE, burst=PER_MX_LIMIT * 2, family=0),
+}
+
+
+def mx_family(mx_host: str) -> str:
+    """Limits family of an MX host: its provider when it has its own limits, else default."""
+    provider = provider_for_mx(mx_host)
+    return provider if provider in FAMILY_LIMITS else "default"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    async def take(self) -> None:
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _HostState:
+    __slots__ = ("semaphore", "bucket", "active")
+
+    def __init__(self, limits: MXLimits):
+        self.semaphore = asyncio.Semaphore(limits.per_host)
+        self.bucket = TokenBucket(limits.rate, limits.burst)
+        self.active = 0
+
+
+class MXGovernor:
+    """
+    Per-MX-host concurrency + token-bucket rate limiter for SMTP probes.
+    Slots are taken host first, then family, then the global cap, so tasks
+    queued on one busy host never hold global capacity other hosts could use.
+    """
+    def __init__(
+        self,
+        global_limit: int = SMTP_CONCURRENCY,
+        limits: Optional[Dict[str, MXLimits]] = None,
+        max_hosts: int = 5000,
+    ):
+        self._limits = limits or FAMILY_LIMITS
+        self._global = asyncio.Semaphore(global_limit)
+        self._hosts: Dict[str, _HostState] = {}
+        self._families: Dict[str, asyncio.Semaphore] = {
+            name: asyncio.Semaphore(l.family) for name, l in self._limits.items() if l.family > 0
+        }
+        self._max_hosts = max_hosts
+
+    def limits_for(self, mx_host: str) -> MXLimits:
+        return self._limits.get(mx_family(mx_host), self._limits["default"])
+
+    def _host(self, mx_host: str) -> _HostState:
+        state = self._hosts.get(mx_host)
+        if state is None:
+            if len(self._hosts) >= self._max_hosts:
+                for h in [h for h, s in self._hosts.items() if s.active == 0]:
+                    del self._hosts[h]
+            state = self._hosts[mx_host] = _HostState(self.limits_for(mx_host))
+        return state
+
+    @asynccontextmanager
+    async def slot(self, mx_host: str):
+        mx_host = (mx_host or "").lower().rstrip(".")
+        state = self._host(mx_host)
+        family = self._families.get(mx_family(mx_host))
+        state.active += 1
+        try:
+            async with state.semaphore:
+                if family is not None:
+                    await family.acquire()
+                try:
+                    await state.bucket.take()
+                    async with self._global:
+                        yield
+                finally:
+                    if family is not None:
+                        family.release()
+        finally:
+            state.active -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"hosts": len(self._hosts), "active": sum(s.active for s in self._hosts.values())}
+
+
+mx_governor = MXGovernor()
@@ -1,9 +1,17 @@
 # worker/verifier/provider_profiles.py
-from typing import Optional
+import os
+from functools import lru_cache
+from typing import Iterable, NamedTuple, Optional
 
+# Provider values (exported as checks.provider) name the mailbox platform,
+# not the consumer brand: "google" covers gmail.com and Google Workspace
+# domains alike (earlier releases reported "gmail" for gmail.com only),
+# "microsoft" covers outlook.com, hotmail.com and Microsoft 365.
+
+# Consumer mailbox domains whose provider is known without looking at MX
 COMMON_PROVIDERS = {
-    "gmail.com": "gmail",
-    "googlemail.com": "gmail",
+    "gmail.com": "google",
+    "googlemail.com": "google",
     "yahoo.com": "yahoo",
     "hotmail.com": "microsoft",
     "outlook.com": "microsoft",
@@ -12,8 +20,80 @@ COMMON_PROVIDERS = {
     "zoho.com": "zoho",
 }
 
-def identify_provider(domain: str) -> Optional[str]:
+# MX hostname suffix -> provider. Custom domains hosted on Google Workspace,
+# Microsoft 365 etc. are only recognizable by where their MX points.
+# Checked in order, first match wins.
+MX_PROVIDER_SUFFIXES = (
+    ("google.com", "google"),
+    ("googlemail.com", "google"),
+    ("mail.protection.outlook.com", "microsoft"),
+    ("outlook.com", "microsoft"),
+    ("hotmail.com", "microsoft"),
+    ("yahoodns.net", "yahoo"),
+    ("icloud.com", "apple"),
+    ("protonmail.ch", "protonmail"),
+    ("zoho.com", "zoho"),
+    ("zoho.eu", "zoho"),
+    ("messagingengine.com", "fastmail"),
+    ("yandex.net", "yandex"),
+    ("secureserver.net", "godaddy"),
+    ("mimecast.com", "mimecast"),
+    ("pphosted.com", "proofpoint"),
+    ("barracudanetworks.com", "barracuda"),
+)
+
+
+@lru_cache(maxsize=int(os.getenv("MX_PROVIDER_CACHE_SIZE", "65536")))
+def _match_mx(host: str) -> Optional[str]:
+    for suffix, provider in MX_PROVIDER_SUFFIXES:
+        if host == suffix or host.endswith("." + suffix):
+            return provider
+    return None
+
+
+def provider_for_mx(mx_host: str) -> Optional[str]:
+    """Provider behind an MX hostname; the pattern table is scanned once per host."""
+    if not mx_host:
+        return None
+    return _match_mx(mx_host.lower().rstrip("."))
+
+
+def identify_provider(domain: str, mx_hosts: Optional[Iterable[str]] = None) -> Optional[str]:
+    """Provider by MX fingerprint (first recognized host), else by consumer domain."""
+    for host in mx_hosts or ():
+        provider = provider_for_mx(host)
+        if provider:
+            return provider
     if not domain:
         return None
     d = domain.lower()
     return COMMON_PROVIDERS.get(d)
+
+
+# SMTP policy per provider, read by the worker before any SMTP work:
+#   probe  - catch-all probe per domain, then RCPT probe per mailbox
+#   domain - cheaper signal: the per-domain catch-all probe only (gateways
+#            that accept every RCPT or defer per-mailbox probes)
+#   skip   - no SMTP at all; SMTP-derived checks stay unknown
+PROBE = "probe"
+DOMAIN_ONLY = "domain"
+SKIP = "skip"
+
+
+class ProviderPolicy(NamedTuple):
+    action: str
+    reason: str
+
+
+DEFAULT_POLICY = ProviderPolicy(PROBE, "")
+
+PROVIDER_POLICIES = {
+    "yahoo": ProviderPolicy(SKIP, "accepts every RCPT, rejects after DATA"),
+    "mimecast": ProviderPolicy(DOMAIN_ONLY, "gateway accepts or defers per-mailbox probes"),
+    "proofpoint": ProviderPolicy(DOMAIN_ONLY, "gateway accepts or defers per-mailbox probes"),
+    "barracuda": ProviderPolicy(DOMAIN_ONLY, "gateway accepts or defers per-mailbox probes"),
+}
+
+
+def provider_policy(provider: Optional[str]) -> ProviderPolicy:
+    return PROVIDER_POLICIES.get(provider, DEFAULT_POLICY)
@@ -50,8 +50,9 @@ def compute_score_and_status(
         score = max(10, score - 20)
 
     # provider adjustments
-    if provider == "gmail":
-        # gmail often accepts; but we trust it slightly more
+    if provider == "google" and smtp_accept is True:
+        # google rejects unknown mailboxes at RCPT, so its accept is trusted
+        # slightly more; never lift an explicit rejection
         score = min(100, score + 5)
 
     # clamp
@@ -1,52 +1,160 @@
 # worker/verifier/smtp_engine.py
 import asyncio
-from aiosmtplib import SMTP, SMTPException
-from typing import Tuple, Optional
+import os
+import time
+from aiosmtplib import SMTP, SMTPConnectError, SMTPException, SMTPRecipientRefused, SMTPSenderRefused
+from typing import Dict, Optional, Tuple
+
+from .latency import LatencyTracker
+from .mx_governor import mx_governor
+from .smtp_pool import SMTPSessionPool
 
 # Non-intrusive SMTP RCPT check:
 # connect -> HELO/EHLO -> MAIL FROM -> RCPT TO -> QUIT
+# With SMTP_SESSION_REUSE (default) sessions are pooled per MX host and
+# serve many RCPT TO probes before QUIT.
 # NOTE: observe provider throttling and aggressive timeouts.
+# Every probe runs inside an mx_governor slot (per-host concurrency + rate).
+
+SMTP_SESSION_REUSE = os.getenv("SMTP_SESSION_REUSE", "true").lower() in ("1", "true", "yes")
+
+smtp_pool = SMTPSessionPool(
+    max_rcpt_per_session=int(os.getenv("SMTP_MAX_RCPT_PER_SESSION", "50")),
+    rcpt_per_batch=int(os.getenv("SMTP_RCPT_PER_BATCH", "10")),
+    max_idle_per_host=int(os.getenv("SMTP_MAX_IDLE_PER_HOST", "4")),
+    idle_timeout=float(os.getenv("SMTP_IDLE_TIMEOUT", "20")),
+)
+
+
+# Per-MX-host latency: probe timeouts follow each host's p95/EWMA, and a
+# host that keeps timing out or refusing connections is skipped for
+# SMTP_BREAKER_COOLDOWN seconds instead of holding slots for full timeouts.
+# Session setup (connect, banner, EHLO, MAIL FROM) and RCPT round trips are
+# tracked apart: a greet delay must not be timed against fast pooled RCPTs.
+smtp_latency = LatencyTracker(
+    default_timeout=float(os.getenv("SMTP_TIMEOUT", "8")),
+    min_timeout=float(os.getenv("SMTP_MIN_TIMEOUT", "2")),
+    max_timeout=float(os.getenv("SMTP_MAX_TIMEOUT", "15")),
+    failure_threshold=int(os.getenv("SMTP_BREAKER_THRESHOLD", "3")),
+    cooldown=float(os.getenv("SMTP_BREAKER_COOLDOWN", "300")),
+)
+smtp_rcpt_latency = LatencyTracker(
+    default_timeout=float(os.getenv("SMTP_TIMEOUT", "8")),
+    min_timeout=float(os.getenv("SMTP_MIN_TIMEOUT", "2")),
+    max_timeout=float(os.getenv("SMTP_MAX_TIMEOUT", "15")),
+)
+
+
+def _decode(message) -> str:
+    return message.decode() if isinstance(message, bytes) else str(message)
+
+
+async def _probe_once(
+    mx_host: str,
+    target_email: str,
+    mail_from: str,
+    setup_timeout: float,
+    rcpt_timeout: float,
+    timing: Dict[str, float],
+) -> Tuple[int, str]:
+    started = time.monotonic()
+    smtp = SMTP(hostname=mx_host, timeout=setup_timeout)
+    await smtp.connect()
+    try:
+        await smtp.mail(mail_from)
+        timing["setup"] = time.monotonic() - started
+        started = time.monotonic()
+        try:
+            resp = await smtp.rcpt(target_email, timeout=rcpt_timeout)
+            code, message = resp.code, resp.message
+        except SMTPRecipientRefused as e:
+            code, message = e.code, e.message
+        timing["rcpt"] = time.monotonic() - started
+        return code, message
+    finally:
+        try:
+            await smtp.quit()
+        except Exception:
+            smtp.close()
 
-async def smtp_check_rcpt(mx_host: str, target_email: str, mail_from: str = "verify@localhost", timeout: float = 8.0) -> Tuple[bool, Optional[str]]:
+
+def _record_success(host: str, timing: Dict[str, float]) -> None:
+    # a reused session adds no setup sample but still closes the breaker
+    smtp_latency.record_success(host, timing.get("setup"))
+    if "rcpt" in timing:
+        smtp_rcpt_latency.record_success(host, timing["rcpt"])
+
+
+async def smtp_check_rcpt(
+    mx_host: str,
+    target_email: str,
+    mail_from: str = "verify@localhost",
+    timeout: Optional[float] = None,
+) -> Tuple[bool, Optional[str]]:
     """
     Try non-intrusive RCPT TO check against an MX host.
     Returns (accepted:boolean, reason:str|null)
-    If connection fails or times out -> (False, "error")
+    reason is "<code> <message>" when the server answered RCPT TO.
+    If connection fails or times out -> (False, "timeout" | "connect-exception:...")
+    While the host's circuit breaker is open -> (False, "circuit-open")
+    Without an explicit timeout, session setup and RCPT are each bounded by
+    a timeout derived from the host's latency for that phase.
     """
     if not mx_host or not target_email:
         return False, "invalid-args"
 
-    try:
-        smtp = SMTP(hostname=mx_host, timeout=timeout)
-        await smtp.connect()
-        # EHLO/HELO
-        try:
-            await smtp.ehlo_or_helo_if_needed()
-        except Exception:
-            pass
+    host = mx_host.lower().rstrip(".")
+    # cheap early exit before queueing for the host's slot
+    if smtp_latency.is_open(host):
+        return False, "circuit-open"
 
-        # MAIL FROM
-        try:
-            resp = await smtp.mail(mail_from)
-        except SMTPException:
-            # some servers fail MAIL FROM, treat as unknown
-            await smtp.quit()
-            return False, "mail-from-reject"
-
-        # RCPT TO
-        try:
-            code, message = await smtp.rcpt(target_email)
-            # codes 250 and 251 usually mean accepted; 550/551 banned
-            accepted = int(code) >= 200 and int(code) < 400
-            await smtp.quit()
-            return accepted, f"{code} {message.decode() if isinstance(message, bytes) else message}"
-        except SMTPException as e:
+    try:
+        async with mx_governor.slot(mx_host):
+            # the breaker may have opened while we waited for the slot, and
+            # the timeout should reflect what the host looks like now
+            if not smtp_latency.allow(host):
+                return False, "circuit-open"
+            setup_timeout = timeout if timeout is not None else smtp_latency.timeout(host)
+            rcpt_timeout = timeout if timeout is not None else smtp_rcpt_latency.timeout(host)
+            timing: Dict[str, float] = {}
+            started = time.monotonic()
             try:
-                await smtp.quit()
-            except Exception:
-                pass
-            return False, f"rcpt-exception:{str(e)}"
+                if SMTP_SESSION_REUSE:
+                    code, message = await smtp_pool.probe(
+                        mx_host, target_email, mail_from, setup_timeout, rcpt_timeout, timing
+                    )
+                else:
+                    code, message = await _probe_once(
+                        mx_host, target_email, mail_from, setup_timeout, rcpt_timeout, timing
+                    )
+            except asyncio.TimeoutError:
+                # censored sample on the series of the phase that timed out:
+                # the real latency is at least the timeout
+                if "setup" in timing or "reused" in timing:
+                    smtp_rcpt_latency.record_failure(host, elapsed=rcpt_timeout)
+                    smtp_latency.record_failure(host)
+                else:
+                    smtp_latency.record_failure(host, elapsed=time.monotonic() - started)
+                raise
+            except (SMTPConnectError, OSError):
+                smtp_latency.record_failure(host)
+                raise
+            except SMTPException:
+                # the server answered, just not with what we wanted
+                _record_success(host, timing)
+                raise
+            _record_success(host, timing)
+        # codes 250 and 251 usually mean accepted; 550/551 banned
+        accepted = int(code) >= 200 and int(code) < 400
+        return accepted, f"{code} {_decode(message)}"
+    except SMTPSenderRefused:
+        # some servers fail MAIL FROM, treat as unknown
+        return False, "mail-from-reject"
     except asyncio.TimeoutError:
         return False, "timeout"
+    except SMTPConnectError as e:
+        return False, f"connect-exception:{str(e)}"
+    except SMTPException as e:
+        return False, f"rcpt-exception:{str(e)}"
     except Exception as e:
         return False, f"connect-exception:{str(e)}"
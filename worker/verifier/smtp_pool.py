@@ -0,0 +1,162 @@
+# worker/verifier/smtp_pool.py
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from aiosmtplib import SMTP, SMTPRecipientRefused, SMTPServerDisconnected
+
+# Reusable SMTP sessions keyed by (mx_host, mail_from):
+# connect -> EHLO -> MAIL FROM once, then many RCPT TO probes.
+# RSET + MAIL FROM between batches, QUIT after max_rcpt_per_session.
+
+SessionKey = Tuple[str, str]
+
+
+class _Session:
+    __slots__ = ("key", "smtp", "rcpt_count", "batch_count", "last_used")
+
+    def __init__(self, key: SessionKey, smtp: SMTP):
+        self.key = key
+        self.smtp = smtp
+        self.rcpt_count = 0
+        self.batch_count = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPSessionPool:
+    """
+    Pool of open SMTP sessions per MX host. Each session serves one probe at
+    a time; idle sessions are reused LIFO and dropped once stale.
+    """
+    def __init__(
+        self,
+        max_rcpt_per_session: int = 50,
+        rcpt_per_batch: int = 10,
+        max_idle_per_host: int = 4,
+        idle_timeout: float = 20.0,
+    ):
+        self.max_rcpt_per_session = max_rcpt_per_session
+        self.rcpt_per_batch = rcpt_per_batch
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self._idle: Dict[SessionKey, List[_Session]] = {}
+        self.opened = 0
+        self.reused = 0
+
+    async def _open(self, key: SessionKey, timeout: float) -> _Session:
+        mx_host, mail_from = key
+        smtp = SMTP(hostname=mx_host, timeout=timeout)
+        await smtp.connect()
+        session = _Session(key, smtp)
+        try:
+            # MAIL FROM triggers EHLO/HELO when needed
+            await smtp.mail(mail_from)
+        except BaseException:
+            await self._close(session)
+            raise
+        self.opened += 1
+        return session
+
+    async def _close(self, session: _Session) -> None:
+        try:
+            await asyncio.wait_for(session.smtp.quit(), timeout=2.0)
+        except BaseException:
+            session.smtp.close()
+
+    def _usable(self, session: _Session) -> bool:
+        return (
+            session.smtp.is_connected
+            and time.monotonic() - session.last_used < self.idle_timeout
+        )
+
+    async def _acquire(self, key: SessionKey, timeout: float) -> Tuple[_Session, bool]:
+        idle = self._idle.get(key)
+        while idle:
+            session = idle.pop()
+            if self._usable(session):
+                self.reused += 1
+                return session, True
+            await self._close(session)
+        return await self._open(key, timeout), False
+
+    async def _release(self, session: _Session, healthy: bool) -> None:
+        session.last_used = time.monotonic()
+        idle = self._idle.setdefault(session.key, [])
+        if (
+            healthy
+            and session.rcpt_count < self.max_rcpt_per_session
+            and len(idle) < self.max_idle_per_host
+        ):
+            idle.append(session)
+            return
+        await self._close(session)
+
+    async def probe(
+        self,
+        mx_host: str,
+        target_email: str,
+        mail_from: str,
+        setup_timeout: float,
+        rcpt_timeout: float,
+        timing: Optional[Dict[str, float]] = None,
+    ) -> Tuple[int, str]:
+        """
+        Issue RCPT TO on a pooled session. Returns (code, message).
+        A reused session that turns out to be dead is replaced once.
+        Opening a session (connect, banner, EHLO, MAIL FROM) is bounded by
+        setup_timeout, commands on an open session by rcpt_timeout. timing,
+        if given, receives "setup" (fresh sessions only) and "rcpt" seconds
+        as each phase completes; "reused" marks a pooled session.
+        """
+        key = (mx_host.lower(), mail_from)
+        if timing is None:
+            timing = {}
+        for attempt in (1, 2):
+            timing.clear()
+            started = time.monotonic()
+            session, reused = await self._acquire(key, setup_timeout)
+            if reused:
+                timing["reused"] = 1.0
+            else:
+                timing["setup"] = time.monotonic() - started
+            healthy = True
+            try:
+                smtp = session.smtp
+                started = time.monotonic()
+                if session.batch_count >= self.rcpt_per_batch:
+                    await smtp.rset(timeout=rcpt_timeout)
+                    await smtp.mail(mail_from, timeout=rcpt_timeout)
+                    session.batch_count = 0
+                try:
+                    resp = await smtp.rcpt(target_email, timeout=rcpt_timeout)
+                    code, message = resp.code, resp.message
+                except SMTPRecipientRefused as e:
+                    code, message = e.code, e.message
+                timing["rcpt"] = time.monotonic() - started
+                session.rcpt_count += 1
+                session.batch_count += 1
+                # 421: server is closing the channel
+                healthy = code != 421
+                return int(code), message
+            except (SMTPServerDisconnected, ConnectionError):
+                healthy = False
+                if reused and attempt == 1:
+                    continue
+                raise
+            except BaseException:
+                healthy = False
+                raise
+            finally:
+                await self._release(session, healthy)
+
+    async def close_all(self) -> None:
+        sessions = [s for idle in self._idle.values() for s in idle]
+        self._idle.clear()
+        await asyncio.gather(*(self._close(s) for s in sessions), return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "opened": self.opened,
+            "reused": self.reused,
+            "idle": sum(len(v) for v in self._idle.values()),
+        }
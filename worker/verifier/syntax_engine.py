@@ -1,15 +1,135 @@
 # worker/verifier/syntax_engine.py
 import re
+from typing import Iterable, List, NamedTuple, Optional, Tuple
 
-# RFC-light regex (practical)
-EMAIL_REGEX = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+# RFC 5321 size limits (octets)
+MAX_LOCAL_LENGTH = 64
+MAX_DOMAIN_LENGTH = 253
+MAX_LABEL_LENGTH = 63
 
-def is_syntax_valid(addr: str) -> bool:
-    if not addr or "@" not in addr:
+_ATEXT = r"[a-z0-9!#$%&'*+/=?^_`{|}~-]"
+_LABEL = r"[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?"
+
+# Fast path: dot-atom local part @ LDH hostname with an alphabetic TLD.
+# Label lengths are enforced by the pattern; the two overall limits are
+# checked separately. Covers nearly every real address in one match().
+FAST_REGEX = re.compile(
+    rf"{_ATEXT}+(?:\.{_ATEXT}+)*@(?:{_LABEL}\.)+[a-z](?:[a-z0-9-]{{0,61}}[a-z0-9])?",
+    re.IGNORECASE,
+)
+_DOT_ATOM = re.compile(rf"{_ATEXT}+(?:\.{_ATEXT}+)*", re.IGNORECASE)
+# quoted-string: printable ASCII except " and \, or a backslash-escaped char
+_QUOTED = re.compile(r'"(?:[\x20\x21\x23-\x5b\x5d-\x7e]|\\[\x20-\x7e])*"')
+_LDH_LABEL = re.compile(_LABEL, re.IGNORECASE)
+
+# kept for callers that only want a cheap pre-filter
+EMAIL_REGEX = FAST_REGEX
+
+
+def _fast_split(addr: str) -> Optional[Tuple[str, str]]:
+    if FAST_REGEX.fullmatch(addr) is None:
+        return None
+    local, _, domain = addr.rpartition("@")
+    if len(local) > MAX_LOCAL_LENGTH or len(domain) > MAX_DOMAIN_LENGTH:
+        return None
+    return local, domain
+
+
+def _valid_local(local: str) -> bool:
+    if not local or len(local.encode("utf-8")) > MAX_LOCAL_LENGTH:
         return False
-    return EMAIL_REGEX.match(addr) is not None
+    if local.startswith('"'):
+        return _QUOTED.fullmatch(local) is not None
+    return _DOT_ATOM.fullmatch(local) is not None
+
+
+def to_ascii_domain(domain: str) -> Optional[str]:
+    """
+    Validate a domain and return its ASCII (IDNA punycode) form, or None.
+    Address literals ([1.2.3.4]) and numeric TLDs are rejected: they cannot
+    be verified through MX lookups.
+    """
+    if not domain or domain.startswith("["):
+        return None
+    try:
+        ascii_domain = domain.encode("idna").decode("ascii") if not domain.isascii() else domain
+    except UnicodeError:
+        return None
+    if len(ascii_domain) > MAX_DOMAIN_LENGTH:
+        return None
+    labels = ascii_domain.split(".")
+    if len(labels) < 2:
+        return None
+    for label in labels:
+        if len(label) > MAX_LABEL_LENGTH or _LDH_LABEL.fullmatch(label) is None:
+            return None
+    if labels[-1].isdigit():
+        return None
+    return ascii_domain.lower()
+
+
+def parse_address(addr: str) -> Optional[Tuple[str, str]]:
+    """
+    Full validator: returns (local, ascii_domain) or None. Handles quoted
+    local parts, internationalized domains (converted to punycode) and the
+    RFC 5321 length and label rules. Tries the compiled fast path first.
+    """
+    if not addr:
+        return None
+    split = _fast_split(addr)
+    if split is not None:
+        return split
+    local, at, domain = addr.rpartition("@")
+    if not at or not _valid_local(local):
+        return None
+    ascii_domain = to_ascii_domain(domain)
+    if ascii_domain is None:
+        return None
+    return local, ascii_domain
+
+
+def is_syntax_valid(addr: str) -> bool:
+    return parse_address(addr) is not None
+
 
 def normalize_email(addr: str) -> str:
     if not addr:
         return ""
     return addr.strip().lower()
+
+
+class ParsedEmail(NamedTuple):
+    raw: str
+    normalized: str
+    local: str
+    domain: str
+
+
+def prepare_batch(addrs: Iterable[str]) -> Tuple[List[ParsedEmail], List[ParsedEmail]]:
+    """
+    Normalize, validate and split a whole chunk in one pass.
+    Returns (valid, invalid); invalid entries keep whatever local/domain
+    split there is so they can still be reported. `normalized` is always
+    the lowercased input, so it stays unique per uploaded address; only
+    `domain` is converted to punycode, ready for DNS and SMTP.
+    """
+    fast = FAST_REGEX.fullmatch
+    valid: List[ParsedEmail] = []
+    invalid: List[ParsedEmail] = []
+    for raw in addrs:
+        normalized = (raw or "").strip().lower()
+        local, at, domain = normalized.rpartition("@")
+        if (
+            fast(normalized) is not None
+            and len(local) <= MAX_LOCAL_LENGTH
+            and len(domain) <= MAX_DOMAIN_LENGTH
+        ):
+            valid.append(ParsedEmail(raw, normalized, local, domain))
+            continue
+        split = parse_address(normalized)
+        if split is None:
+            invalid.append(ParsedEmail(raw, normalized, local, domain if at else ""))
+            continue
+        local, domain = split
+        valid.append(ParsedEmail(raw, normalized, local, domain))
+    return valid, invalid
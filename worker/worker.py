@@ -1,13 +1,16 @@
 # worker/worker.py
 import asyncio
-import json
 import logging
 import os
 import sys
 import inspect
 import signal
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import chain, zip_longest
 from pathlib import Path
-from typing import List, Optional, Tuple, Any, Dict
+from typing import List, NamedTuple, Optional, Tuple, Any, Dict
 from sqlalchemy import update, select
 
 # SIGNAL HANDLING
@@ -19,23 +22,6 @@ loop = asyncio.get_event_loop()
 for sig in (signal.SIGINT, signal.SIGTERM):
     loop.add_signal_handler(sig, cancel_all_tasks)
 
-# -------------------------------------------------------------------
-# safe_blpop shutdown-safe version
-# -------------------------------------------------------------------
-async def safe_blpop(r, key, timeout):
-    try:
-        return await r.blpop(key, timeout=timeout)
-    except (asyncio.CancelledError, GeneratorExit):
-        return None
-    except Exception as e:
-        LOG.error("Redis BLPOP failed: %s — attempting reconnect", e)
-        try:
-            await r.aclose()
-        except Exception:
-            pass
-        await asyncio.sleep(0.2)
-        return None
-
 # -------------------------------------------------------------------
 # Safe DB wrappers
 # -------------------------------------------------------------------
@@ -99,7 +85,12 @@ from sqlalchemy.orm import sessionmaker
 
 from app.config import settings
 from app.models.upload import Upload, UploadStatus
-from app.models.email_result import EmailResult
+
+from utils.domain_cache import DomainCache
+from utils.greylist import GreylistQueue
+from utils.job_queue import ListQueue, ReliableQueue, StreamQueue
+from utils.progress import ProgressReporter
+from utils.result_writer import ResultBuffer, write_results
 
 # Logging
 logging.basicConfig(
@@ -124,56 +115,150 @@ AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSes
 # Concurrency config
 WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "50"))
 DNS_CONCURRENCY = int(os.getenv("DNS_CONCURRENCY", "50"))
-SMTP_CONCURRENCY = int(os.getenv("SMTP_CONCURRENCY", "25"))
+WORKER_SMTP = os.getenv("WORKER_SMTP", "false").lower() in ("1", "true", "yes")
+# finished results are flushed every BATCH_INSERT rows or FLUSH_INTERVAL_MS
+BATCH_INSERT = int(os.getenv("BATCH_INSERT", "200"))
+FLUSH_INTERVAL_MS = int(os.getenv("FLUSH_INTERVAL_MS", "1000"))
+# result batches of this size or more are written with COPY; defaults to
+# BATCH_INSERT so full buffer flushes take COPY and the smaller interval
+# flushes take a multi-row INSERT
+COPY_THRESHOLD = int(os.getenv("COPY_THRESHOLD", str(BATCH_INSERT)))
+
+# Job queue (settings.QUEUE_MODE=reliable|stream: in-flight tracking + heartbeats)
+WORKER_ID = os.getenv("FLY_MACHINE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+QUEUE_HEARTBEAT_TTL = float(os.getenv("QUEUE_HEARTBEAT_TTL", "30"))
+QUEUE_REAP_INTERVAL = float(os.getenv("QUEUE_REAP_INTERVAL", "15"))
+QUEUE_MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "5"))
 
 _semaphore = asyncio.Semaphore(WORKER_CONCURRENCY)
 _dns_semaphore = asyncio.Semaphore(DNS_CONCURRENCY)
-_smtp_semaphore = asyncio.Semaphore(SMTP_CONCURRENCY)
+
+# Per-upload progress hash + SSE publish, flushed every PROGRESS_FLUSH_MS
+progress = ProgressReporter(
+    channel_prefix=settings.PROGRESS_CHANNEL_PREFIX,
+    interval=int(os.getenv("PROGRESS_FLUSH_MS", "250")) / 1000.0,
+)
+
+# Greylisted (450/451) RCPT probes are re-probed later from a Redis zset
+greylist = GreylistQueue(
+    key=os.getenv("GREYLIST_KEY", "mailscout:greylist"),
+    # re-probes go out from the machine (egress IP) that was greylisted
+    worker_id=WORKER_ID,
+    base_delay=float(os.getenv("GREYLIST_BASE_DELAY", "300")),
+    max_delay=float(os.getenv("GREYLIST_MAX_DELAY", "3600")),
+    max_attempts=int(os.getenv("GREYLIST_MAX_ATTEMPTS", "4")),
+    batch_size=int(os.getenv("GREYLIST_BATCH_SIZE", "100")),
+)
+
+# Cross-worker domain facts cache (bump DOMAIN_CACHE_VERSION to invalidate)
+domain_cache = DomainCache(
+    version=os.getenv("DOMAIN_CACHE_VERSION", "2"),
+    ttl_seconds=int(os.getenv("DOMAIN_CACHE_TTL", "86400")),
+    negative_ttl_seconds=int(os.getenv("DOMAIN_CACHE_NEGATIVE_TTL", "3600")),
+)
 
 
-async def _call_verifier(fn, *args, **kwargs):
-    if fn is None:
+# -------------------------------------------------------------------
+# Verifier dispatch
+# -------------------------------------------------------------------
+# Sync verifiers that only do in-memory work (regex, set/dict lookups,
+# arithmetic) are called inline on the loop; a thread hop would cost more
+# than the call. Any other sync verifier is assumed to block and runs on a
+# dedicated pool of VERIFIER_THREADS threads.
+INLINE_VERIFIERS = frozenset({
+    "normalize_email",
+    "is_syntax_valid",
+    "prepare_batch",
+    "is_disposable",
+    "identify_provider",
+    "provider_policy",
+    "compute_score_and_status",
+})
+VERIFIER_THREADS = int(os.getenv("VERIFIER_THREADS", "4"))
+
+_verifier_executor = ThreadPoolExecutor(max_workers=VERIFIER_THREADS, thread_name_prefix="verifier")
+
+
+class _Verifier(NamedTuple):
+    fn: Any
+    mode: str  # "async" | "inline" | "executor"
+
+
+def _resolve_verifiers(names) -> Dict[str, _Verifier]:
+    """Look every verifier up once and decide how it is called."""
+    table: Dict[str, _Verifier] = {}
+    for name in names:
+        fn = getattr(ms_verifier, name, None) if ms_verifier else None
+        if fn is None:
+            continue
+        if inspect.iscoroutinefunction(fn):
+            mode = "async"
+        elif name in INLINE_VERIFIERS:
+            mode = "inline"
+        else:
+            mode = "executor"
+        table[name] = _Verifier(fn, mode)
+    return table
+
+
+VERIFIERS = _resolve_verifiers((
+    "prepare_batch",
+    "is_disposable",
+    "resolve_mx_for_domain",
+    "smtp_check_rcpt",
+    "catch_all_verdict",
+    "identify_provider",
+    "provider_policy",
+    "compute_score_and_status",
+))
+LOG.info("Verifier dispatch: %s", {name: v.mode for name, v in VERIFIERS.items()})
+
+
+async def _call_verifier(name: str, *args, **kwargs):
+    v = VERIFIERS.get(name)
+    if v is None:
         return None
     try:
-        if inspect.iscoroutinefunction(fn):
-            return await fn(*args, **kwargs)
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+        if v.mode == "async":
+            return await v.fn(*args, **kwargs)
+        if v.mode == "inline":
+            return v.fn(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_verifier_executor, partial(v.fn, *args, **kwargs))
     except Exception as e:
-        LOG.debug("verifier function %s raised %s", getattr(fn, "__name__", str(fn)), e)
+        LOG.debug("verifier function %s raised %s", name, e)
         return None
 
 
-async def normalize_email(email: str) -> str:
-    if not ms_verifier:
-        return (email or "").lower().strip()
-    fn = getattr(ms_verifier, "normalize_email", None)
-    out = await _call_verifier(fn, email)
-    return (out or email or "").lower().strip()
-
-
-async def is_syntax_valid(email: str) -> bool:
-    if not ms_verifier:
-        return "@" in (email or "") and "." in (email.split("@")[-1] or "")
-    fn = getattr(ms_verifier, "is_syntax_valid", None)
-    out = await _call_verifier(fn, email)
-    return bool(out)
-
-
-async def is_disposable(email: str) -> bool:
-    if not ms_verifier:
+def prepare_batch(emails: List[str]) -> Tuple[list, list]:
+    """
+    Normalize, syntax-check and split a whole chunk in one inline pass.
+    Returns (valid, invalid) lists of (raw, normalized, local, domain).
+    """
+    v = VERIFIERS.get("prepare_batch")
+    if v is not None:
+        return v.fn(emails)
+    valid, invalid = [], []
+    for raw in emails:
+        normalized = (raw or "").strip().lower()
+        local, at, domain = normalized.rpartition("@")
+        parsed = (raw, normalized, local, domain if at else "")
+        (valid if local and "." in domain else invalid).append(parsed)
+    return valid, invalid
+
+
+async def is_disposable(domain: str) -> bool:
+    if not ms_verifier or not domain:
         return False
-    fn = getattr(ms_verifier, "is_disposable", None)
-    out = await _call_verifier(fn, email)
+    out = await _call_verifier("is_disposable", domain)
     return bool(out)
 
 
 async def resolve_mx_for_domain(domain: str) -> List[str]:
     if not ms_verifier or not domain:
         return []
-    fn = getattr(ms_verifier, "resolve_mx_for_domain", None)
     async with _dns_semaphore:
-        out = await _call_verifier(fn, domain)
+        out = await _call_verifier("resolve_mx_for_domain", domain)
     if out is None:
         return []
     try:
@@ -182,28 +267,58 @@ async def resolve_mx_for_domain(domain: str) -> List[str]:
         return []
 
 
-async def smtp_check_rcpt(domain_or_mailbox: str) -> Optional[bool]:
-    if not ms_verifier:
+def _smtp_verdict(out) -> Optional[bool]:
+    """
+    Map (accepted, reason) from the SMTP engine to True / False / None.
+    Only an explicit 5xx reply counts as a rejection; timeouts, connect
+    errors and temporary failures are unknown.
+    """
+    if not isinstance(out, (list, tuple)) or len(out) < 2:
         return None
-    fn = getattr(ms_verifier, "smtp_check_rcpt", None)
-    async with _smtp_semaphore:
-        return await _call_verifier(fn, domain_or_mailbox)
+    accepted, reason = out[0], str(out[1] or "")
+    if accepted:
+        return True
+    if reason[:1] == "5":
+        return False
+    return None
+
 
+def _is_greylisted(out) -> bool:
+    """450/451 on RCPT TO: temporary deferral, worth asking again later."""
+    if not isinstance(out, (list, tuple)) or len(out) < 2 or out[0]:
+        return False
+    return str(out[1] or "")[:3] in ("450", "451")
+
+
+async def smtp_check_rcpt(mx_host: str, email: str) -> Tuple[Optional[bool], bool]:
+    """(verdict, greylisted); verdict is None when unknown."""
+    if not ms_verifier or not mx_host or not email:
+        return None, False
+    # concurrency is governed per MX host (and SMTP_CONCURRENCY globally)
+    # inside the verifier, so catch-all probes are covered too
+    out = await _call_verifier("smtp_check_rcpt", mx_host, email)
+    return _smtp_verdict(out), _is_greylisted(out)
 
-async def is_catch_all(domain: str) -> bool:
+
+async def is_catch_all(domain: str) -> Optional[bool]:
+    """True / False, or None while the verdict is unknown (re-probed later)."""
     if not ms_verifier or not domain:
         return False
-    fn = getattr(ms_verifier, "is_catch_all", None)
     async with _dns_semaphore:
-        out = await _call_verifier(fn, domain)
-    return bool(out)
+        out = await _call_verifier("catch_all_verdict", domain)
+    return None if out is None else bool(out)
 
 
-async def identify_provider(email: str) -> Optional[str]:
-    if not ms_verifier:
+async def identify_provider(domain: str, mx_records: List[str]) -> Optional[str]:
+    if not ms_verifier or not domain:
         return None
-    fn = getattr(ms_verifier, "identify_provider", None)
-    return await _call_verifier(fn, email)
+    return await _call_verifier("identify_provider", domain, mx_records)
+
+
+async def smtp_policy(provider: Optional[str]) -> str:
+    """probe | domain | skip, from the provider policy table (probe when unknown)."""
+    out = await _call_verifier("provider_policy", provider)
+    return getattr(out, "action", None) or "probe"
 
 
 async def compute_score_and_status(email: Optional[str], checks: Dict[str, Any]) -> Tuple[int, str]:
@@ -213,8 +328,15 @@ async def compute_score_and_status(email: Optional[str], checks: Dict[str, Any])
         if checks.get("has_mx"):
             return 90, "valid"
         return 30, "risky"
-    fn = getattr(ms_verifier, "compute_score_and_status", None)
-    out = await _call_verifier(fn, email, checks)
+    out = await _call_verifier(
+        "compute_score_and_status",
+        syntax_ok=bool(checks.get("syntax")),
+        disposable=bool(checks.get("disposable")),
+        mx_hosts=checks.get("mx_records") or [],
+        smtp_accept=checks.get("smtp_accept"),
+        catch_all=bool(checks.get("catch_all")),
+        provider=checks.get("provider"),
+    )
     if isinstance(out, (list, tuple)) and len(out) >= 2:
         try:
             return int(out[0] or 0), str(out[1] or "")
@@ -233,53 +355,287 @@ def _sanitize_for_json(obj):
     return obj
 
 
-async def process_single_email(upload_id: str, email: str) -> Optional[dict]:
-    async with _semaphore:
+def group_by_domain(parsed: List[tuple]) -> Dict[str, List[tuple]]:
+    """Group a chunk's parsed emails by domain, keeping the original order inside each group."""
+    groups: Dict[str, List[tuple]] = {}
+    for p in parsed:
+        groups.setdefault(p[3], []).append(p)
+    return groups
+
+
+def interleave_domains(groups: Dict[str, List[tuple]]) -> List[tuple]:
+    """
+    Round-robin the domain groups so one huge domain cannot take every
+    worker slot (semaphores are FIFO) while it waits on its MX host limits.
+    """
+    marker = object()
+    return [e for e in chain.from_iterable(zip_longest(*groups.values(), fillvalue=marker)) if e is not marker]
+
+
+async def resolve_domain_facts(domain: str) -> Dict[str, Any]:
+    """
+    Resolve the checks that depend only on the domain (MX, catch-all,
+    provider, disposable). Run once per domain and shared by its mailboxes.
+    """
+    mx_records = await resolve_mx_for_domain(domain) if domain else []
+    has_mx = bool(mx_records)
+    disposable_flag = await is_disposable(domain)
+    provider = await identify_provider(domain, mx_records)
+    # the provider policy decides whether SMTP is worth any capacity here
+    policy = await smtp_policy(provider)
+    if not has_mx:
+        catchall_flag = False
+    elif policy == "skip":
+        catchall_flag = None
+    else:
+        catchall_flag = await is_catch_all(domain)
+    return {
+        "domain": domain,
+        "mx_records": mx_records,
+        "has_mx": has_mx,
+        "disposable": disposable_flag,
+        "catch_all": catchall_flag,
+        "provider": provider,
+        "smtp_policy": policy,
+    }
+
+
+async def get_domain_facts(domain_facts: Dict[str, asyncio.Future], domain: str) -> Dict[str, Any]:
+    """Single-flight lookup of domain facts within a chunk."""
+    task = domain_facts.get(domain)
+    if task is None:
+        task = asyncio.create_task(resolve_domain_facts(domain))
+        domain_facts[domain] = task
+    # shield: a cancelled mailbox must not cancel the lookup its siblings share
+    return await asyncio.shield(task)
+
+
+def invalid_result(upload_id: str, parsed: tuple) -> dict:
+    """Result row for an address that failed syntax; no network checks run."""
+    _, normalized, _, domain = parsed
+    return {
+        "upload_id": upload_id,
+        "email": normalized,
+        "normalized": normalized,
+        # score_engine rejects failed syntax outright
+        "status": "invalid",
+        "score": 0,
+        "checks": {
+            "syntax": False,
+            "domain": domain,
+            "mx_records": [],
+            "has_mx": False,
+            "disposable": False,
+            "catch_all": False,
+            "provider": None,
+            "smtp_policy": None,
+            "smtp_accept": None,
+        },
+    }
+
+
+def unverified_result(upload_id: str, parsed: tuple) -> dict:
+    """
+    Result row for an address whose chunk was dead-lettered: nothing could be
+    verified, so it is reported as risky (unknown) with score 0.
+    """
+    _, normalized, _, domain = parsed
+    return {
+        "upload_id": upload_id,
+        "email": normalized,
+        "normalized": normalized,
+        "status": "risky",
+        "score": 0,
+        "checks": {
+            "syntax": True,
+            "domain": domain,
+            "mx_records": [],
+            "has_mx": None,
+            "disposable": None,
+            "catch_all": None,
+            "provider": None,
+            "smtp_policy": None,
+            "smtp_accept": None,
+            "error": "dead-lettered",
+        },
+    }
+
+
+async def build_result(
+    upload_id: str, normalized: str, checks: Dict[str, Any], smtp_accept: Optional[bool]
+) -> dict:
+    checks = dict(checks, smtp_accept=smtp_accept)
+    score, status = await compute_score_and_status(normalized, checks)
+    return {
+        "upload_id": upload_id,
+        "email": normalized,
+        "normalized": normalized,
+        "status": status,
+        "score": int(score or 0),
+        "checks": _sanitize_for_json(checks),
+    }
+
+
+async def process_single_email(
+    upload_id: str, parsed: tuple, domain_facts: Dict[str, asyncio.Future]
+) -> Optional[dict]:
+    """
+    Result row for one address, or {"deferred": True} when its RCPT probe
+    was greylisted and handed to the re-probe scheduler.
+    """
+    raw, normalized, local, domain = parsed
+    try:
+        facts = await get_domain_facts(domain_facts, domain)
+        checks = {
+            # syntax was checked for the whole chunk in prepare_batch
+            "syntax": True,
+            "domain": facts["domain"],
+            "mx_records": facts["mx_records"],
+            "has_mx": facts["has_mx"],
+            "disposable": facts["disposable"],
+            "catch_all": facts["catch_all"],
+            "provider": facts["provider"],
+            "smtp_policy": facts.get("smtp_policy"),
+        }
+
+        async with _semaphore:
+            # per-mailbox stage: only RCPT TO depends on the local part
+            smtp_accept = None
+            if (
+                WORKER_SMTP
+                and facts["has_mx"]
+                and not facts["catch_all"]
+                and facts.get("smtp_policy", "probe") == "probe"
+            ):
+                mx_host = facts["mx_records"][0]
+                # RCPT TO goes out with the ASCII (punycode) domain
+                rcpt = f"{local}@{domain}"
+                smtp_accept, greylisted = await smtp_check_rcpt(mx_host, rcpt)
+                if greylisted:
+                    # no row yet: the upload completes once the re-probe resolves
+                    try:
+                        await greylist.defer({
+                            "upload_id": upload_id,
+                            "email": normalized,
+                            "rcpt": rcpt,
+                            "mx_host": mx_host,
+                            "attempt": 1,
+                            "checks": _sanitize_for_json(checks),
+                        })
+                        return {"deferred": True}
+                    except Exception as e:
+                        # no re-probe entry: write the row now, SMTP unknown
+                        LOG.warning("Greylist defer failed for %s: %s", normalized, e)
+
+            return await build_result(upload_id, normalized, checks, smtp_accept)
+    except Exception:
+        LOG.exception("Error processing email: %s", raw)
+        return None
+
+
+async def reprobe_greylisted(entries: List[Dict[str, Any]]) -> None:
+    """
+    Re-probe a batch of due greylist entries. Entries greylisted again are
+    deferred with a longer backoff until GREYLIST_MAX_ATTEMPTS, then written
+    with an unknown SMTP verdict; the rest are written and counted like any
+    other result so their upload can complete.
+    """
+    async def reprobe(entry: Dict[str, Any]) -> Optional[dict]:
+        async with _semaphore:
+            verdict, greylisted = await smtp_check_rcpt(
+                entry["mx_host"], entry.get("rcpt") or entry["email"]
+            )
+        entry = dict(entry, attempt=int(entry.get("attempt") or 1) + 1)
+        if greylisted and not greylist.exhausted(entry):
+            await greylist.defer(entry)
+            return None
+        return await build_result(entry["upload_id"], entry["email"], entry["checks"], verdict)
+
+    outcomes = await asyncio.gather(*(reprobe(e) for e in entries), return_exceptions=True)
+    rows_by_upload: Dict[str, List[Dict[str, Any]]] = {}
+    finished = []
+    for entry, res in zip(entries, outcomes):
+        if isinstance(res, BaseException):
+            # stays leased in the zset and comes back when the lease ends
+            LOG.warning("Greylist re-probe failed for %s: %s", entry.get("email"), res)
+            continue
+        if res is None:
+            continue
+        rows_by_upload.setdefault(entry["upload_id"], []).append(res)
+        finished.append(entry)
+
+    # one upload failing to flush must not hold back the others' entries
+    flushed = set()
+    for upload_id, rows in rows_by_upload.items():
         try:
-            normalized = await normalize_email(email)
-
-            syntax_ok = await is_syntax_valid(normalized)
-
-            domain = normalized.split("@")[-1] if "@" in normalized else ""
-            mx_records = []
-            if domain:
-                mx_records = await resolve_mx_for_domain(domain) or []
-
-            has_mx = bool(mx_records)
-
-            disposable_flag = await is_disposable(normalized)
-            catchall_flag = await is_catch_all(domain) if domain else False
-            provider = await identify_provider(normalized)
-
-            checks = {
-                "syntax": syntax_ok,
-                "domain": domain,
-                "mx_records": mx_records,
-                "has_mx": has_mx,
-                "disposable": disposable_flag,
-                "catch_all": catchall_flag,
-                "provider": provider,
-            }
-
-            score, status = await compute_score_and_status(normalized, checks)
-            checks = _sanitize_for_json(checks)
-
-            return {
-                "upload_id": upload_id,
-                "email": normalized,
-                "normalized": normalized,
-                "status": status,
-                "score": int(score or 0),
-                "checks": checks,
-            }
+            async with AsyncSessionLocal() as db:
+                await flush_results(db, upload_id, rows)
         except Exception:
-            LOG.exception("Error processing email: %s", email)
-            return None
+            LOG.exception("Greylist flush failed for upload=%s (%d rows)", upload_id, len(rows))
+            continue
+        flushed.add(upload_id)
+    finished = [e for e in finished if e["upload_id"] in flushed]
+    await greylist.done(finished)
+    LOG.info("Greylist re-probes: claimed=%d finished=%d", len(entries), len(finished))
 
 
 # -------------------------------------------------------------------
 # Chunk processing with progress visibility + safe DB
 # -------------------------------------------------------------------
+async def flush_results(db: AsyncSession, upload_id: str, rows: List[Dict[str, Any]]) -> int:
+    """
+    Insert a batch of result rows and bump processed_count and the
+    per-status counters in one transaction, marking the upload completed
+    once every email is in. Committed rows are then handed to the
+    progress reporter.
+    ON CONFLICT (upload_id, normalized) DO NOTHING makes this idempotent,
+    so a retried chunk never double counts; large batches go through COPY.
+    """
+    try:
+        statuses = await write_results(db, rows, copy_threshold=COPY_THRESHOLD)
+        inserted = sum(statuses.values())
+        stmt = (
+            update(Upload)
+            .where(Upload.id == upload_id)
+            .values(
+                processed_count=(Upload.processed_count + inserted),
+                valid_count=(Upload.valid_count + statuses["valid"]),
+                risky_count=(Upload.risky_count + statuses["risky"]),
+                invalid_count=(Upload.invalid_count + statuses["invalid"]),
+            )
+            .returning(
+                Upload.processed_count,
+                Upload.total_count,
+                Upload.valid_count,
+                Upload.risky_count,
+                Upload.invalid_count,
+            )
+        )
+        res = await safe_execute(db, stmt)
+        row = res.fetchone()
+        if not row:
+            await db.rollback()
+            LOG.error("Upload row vanished while updating processed_count: %s", upload_id)
+            return 0
+        updated_processed, total = row[0], row[1]
+        status = UploadStatus.processing
+        if total is not None and updated_processed >= total:
+            status = UploadStatus.completed
+            await safe_execute(
+                db,
+                update(Upload).where(Upload.id == upload_id).values(status=UploadStatus.completed)
+            )
+        await safe_commit(db)
+    except Exception:
+        await db.rollback()
+        LOG.exception("Failed to commit DB changes for upload=%s", upload_id)
+        # the job queue retries the payload
+        raise
+    LOG.debug("Flushed %d result(s) for upload=%s inserted=%d", len(rows), upload_id, inserted)
+    progress.record(upload_id, statuses, total=total, status=status.value)
+    return inserted
+
+
 async def process_payload(payload: dict, db: AsyncSession):
     upload_id = payload.get("upload_id")
     emails: List[str] = payload.get("emails") or []
@@ -298,6 +654,10 @@ async def process_payload(payload: dict, db: AsyncSession):
         LOG.error("Upload not found: %s", upload_id)
         return
 
+    if upload_obj.status == UploadStatus.cancelled:
+        LOG.info("Skipping chunk of cancelled upload=%s", upload_id)
+        return
+
     if upload_obj.status == UploadStatus.queued:
         upload_obj.status = UploadStatus.processing
         try:
@@ -305,114 +665,83 @@ async def process_payload(payload: dict, db: AsyncSession):
         except Exception:
             await db.rollback()
 
-    # process emails...
-    tasks = [asyncio.create_task(process_single_email(upload_id, e)) for e in emails]
-    results = []
-    processed_in_chunk = 0
+    # group by domain: domain-level checks run once per domain and are
+    # fanned out to that domain's mailboxes
+    valid, invalid = prepare_batch(emails)
+    groups = group_by_domain(valid)
     r = redis.from_url(settings.REDIS_URL, decode_responses=True)
 
-    for coro in asyncio.as_completed(tasks):
-        try:
-            res = await coro
-            if res:
-                results.append(res)
+    # seed from the shared Redis tier so a fresh worker starts warm
+    domain_facts: Dict[str, asyncio.Future] = {}
+    cached = await domain_cache.get_many(r, groups.keys())
+    for domain, facts in cached.items():
+        # the disposable list hot-reloads; a local lookup beats a day-old flag
+        facts["disposable"] = await is_disposable(domain)
+        fut = asyncio.get_running_loop().create_future()
+        fut.set_result(facts)
+        domain_facts[domain] = fut
+    LOG.info("Chunk upload=%s domains=%d cached=%d invalid=%d",
+             upload_id, len(groups), len(cached), len(invalid))
+
+    tasks = [
+        asyncio.create_task(process_single_email(upload_id, p, domain_facts))
+        for p in interleave_domains(groups)
+    ]
+    processed_in_chunk = 0
+    deferred = 0
+
+    async def flush(rows: List[Dict[str, Any]]) -> int:
+        return await flush_results(db, upload_id, rows)
+
+    try:
+        async with ResultBuffer(
+            flush, batch_size=BATCH_INSERT, flush_interval=FLUSH_INTERVAL_MS / 1000.0
+        ) as buffer:
+            # syntax failures never reach the network stage
+            for p in invalid:
+                await buffer.add(invalid_result(upload_id, p))
+            processed_in_chunk = len(invalid)
+
+            for coro in asyncio.as_completed(tasks):
+                try:
+                    res = await coro
+                except Exception:
+                    LOG.exception("Unhandled exception in email task")
+                    continue
+                if not res:
+                    continue
+                if res.get("deferred"):
+                    deferred += 1
+                    continue
+                await buffer.add({
+                    "upload_id": res["upload_id"],
+                    "email": res["email"],
+                    "normalized": res["normalized"],
+                    "status": res["status"],
+                    "score": res["score"],
+                    "checks": res["checks"],
+                })
                 processed_in_chunk += 1
                 STEP = 50
                 if processed_in_chunk % STEP == 0 or processed_in_chunk == len(emails):
                     LOG.info("Chunk progress upload=%s processed=%d/%d",
                              upload_id, processed_in_chunk, len(emails))
-                try:
-                    await r.hset(
-                        f"progress:{upload_id}",
-                        mapping={
-                            "processed_in_chunk": processed_in_chunk,
-                            "chunk_size": len(emails),
-                            "timestamp": datetime.utcnow().isoformat(),
-                        },
-                    )
-                except Exception as e:
-                    LOG.debug("Redis progress update failed: %s", e)
-        except Exception:
-            LOG.exception("Unhandled exception in email task")
-
-    await r.aclose()
-
-    if not results:
-        try:
-            await safe_commit(db)
-        except Exception:
-            await db.rollback()
-        return
-
-    # ----------------------------------------------------------
-    # FAST BULK DB INSERT LOGIC (SINGLE INSERT)
-    # ----------------------------------------------------------
-
-    from sqlalchemy.dialects.postgresql import insert as pg_insert
-
-    # 1) Fetch existing emails for this upload in ONE query
-    q_existing = await safe_execute(
-        db,
-        select(EmailResult.email).where(EmailResult.upload_id == upload_id)
-    )
-    existing = set(q_existing.scalars().all())
-
-    # 2) Build list of only new rows
-    rows = [
-        {
-            "upload_id": item["upload_id"],
-            "email": item["email"],
-            "normalized": item["normalized"],
-            "status": item["status"],
-            "score": item["score"],
-            "checks": item["checks"],
+    finally:
+        # a failed flush aborts the chunk; the job queue retries it and the
+        # idempotent insert skips rows that were already flushed
+        for t in tasks:
+            t.cancel()
+        fresh = {
+            domain: fut.result()
+            for domain, fut in domain_facts.items()
+            if domain not in cached and fut.done() and not fut.cancelled() and fut.exception() is None
         }
-        for item in results
-        if item["email"] not in existing
-    ]
-
-    inserted = len(rows)
-
-    # 3) Bulk INSERT in one shot (fastest)
-    if inserted > 0:
-        stmt = pg_insert(EmailResult).values(rows)
-        await safe_execute(db, stmt)
-
-    try:
-        stmt = (
-            update(Upload)
-            .where(Upload.id == upload_id)
-            .values(processed_count=(Upload.processed_count + inserted))
-            .returning(Upload.processed_count, Upload.total_count)
-        )
-        res = await safe_execute(db, stmt)
-        row = res.fetchone()
-        if not row:
-            await db.rollback()
-            LOG.error("Upload row vanished while updating processed_count: %s", upload_id)
-            return
-        updated_processed, total = row[0], row[1]
-        if total is not None and updated_processed >= total:
-            await safe_execute(
-                db,
-                update(Upload).where(Upload.id == upload_id).values(status=UploadStatus.completed)
-            )
-        await safe_commit(db)
-    except Exception as e:
-        await db.rollback()
-        LOG.exception("Failed to commit DB changes for upload=%s", upload_id)
-        # requeue payload
-        try:
-            r = redis.from_url(settings.REDIS_URL, decode_responses=True)
-            await r.rpush(settings.QUEUE_KEY, json.dumps(payload))
-            await r.aclose()
-            LOG.info("Requeued payload for upload=%s after DB failure", upload_id)
-        except Exception as re:
-            LOG.error("Failed to requeue payload: %s", re)
-        return
+        await domain_cache.set_many(r, fresh)
+        await r.aclose()
 
-    LOG.info("Processed payload for upload=%s inserted=%d processed_count=%d total=%d",
-             upload_id, inserted, upload_obj.processed_count or 0, upload_obj.total_count or 0)
+    inserted = buffer.written
+    LOG.info("Processed payload for upload=%s inserted=%d greylisted=%d processed_count=%d total=%d",
+             upload_id, inserted, deferred, upload_obj.processed_count or 0, upload_obj.total_count or 0)
     chunk_end = datetime.utcnow()
     LOG.info(
         "Chunk END upload=%s size=%d time=%s duration=%.2fs",
@@ -421,44 +750,94 @@ async def process_payload(payload: dict, db: AsyncSession):
         chunk_end,
         (chunk_end - chunk_start).total_seconds(),
     )
+    mx_cache = getattr(ms_verifier, "mx_cache", None)
+    if mx_cache is not None:
+        LOG.info("MX cache stats: %s", mx_cache.stats())
+    smtp_latency = getattr(ms_verifier, "smtp_latency", None)
+    if smtp_latency is not None:
+        LOG.info("SMTP latency stats: %s", smtp_latency.stats())
 
 
 # -------------------------------------------------------------------
 # Worker loop
 # -------------------------------------------------------------------
+async def settle_dead_payload(payload: dict) -> None:
+    """
+    A chunk that used up its attempts still has to count towards its upload,
+    or the upload never completes: write a row for every address that has
+    none yet. ON CONFLICT keeps rows the chunk did manage to write.
+    """
+    upload_id = payload.get("upload_id")
+    emails = payload.get("emails") or []
+    if not upload_id or not emails:
+        return
+    valid, invalid = prepare_batch(emails)
+    rows = [invalid_result(upload_id, p) for p in invalid]
+    rows += [unverified_result(upload_id, p) for p in valid]
+    async with AsyncSessionLocal() as db:
+        inserted = await flush_results(db, upload_id, rows)
+    LOG.warning("Dead-lettered chunk of upload=%s settled: %d unverified row(s)", upload_id, inserted)
+
+
+def make_job_queue(r):
+    """Pick the queue backend from settings.QUEUE_MODE (list | reliable | stream)."""
+    if settings.QUEUE_MODE == "stream":
+        return StreamQueue(
+            r,
+            settings.STREAM_KEY,
+            group=settings.STREAM_GROUP,
+            consumer=WORKER_ID,
+            dead_key=f"{settings.QUEUE_KEY}:dead",
+            claim_idle=QUEUE_HEARTBEAT_TTL,
+            heartbeat_interval=QUEUE_HEARTBEAT_TTL / 3,
+            reap_interval=QUEUE_REAP_INTERVAL,
+            max_attempts=QUEUE_MAX_ATTEMPTS,
+            on_dead=settle_dead_payload,
+        )
+    if settings.QUEUE_MODE == "reliable":
+        return ReliableQueue(
+            r,
+            settings.QUEUE_KEY,
+            worker_id=WORKER_ID,
+            heartbeat_ttl=QUEUE_HEARTBEAT_TTL,
+            heartbeat_interval=QUEUE_HEARTBEAT_TTL / 3,
+            reap_interval=QUEUE_REAP_INTERVAL,
+            max_attempts=QUEUE_MAX_ATTEMPTS,
+            on_dead=settle_dead_payload,
+        )
+    return ListQueue(
+        r, settings.QUEUE_KEY, max_attempts=QUEUE_MAX_ATTEMPTS, on_dead=settle_dead_payload
+    )
+
+
 async def worker_loop():
     r = redis.from_url(settings.REDIS_URL, decode_responses=True)
-    LOG.info("Worker connected to Redis: %s queue=%s", settings.REDIS_URL, settings.QUEUE_KEY)
+    queue = make_job_queue(r)
+    LOG.info("Worker %s connected to Redis: %s queue=%s mode=%s",
+             WORKER_ID, settings.REDIS_URL, settings.QUEUE_KEY, settings.QUEUE_MODE)
 
     try:
+        await queue.start()
+        await progress.start(r)
+        await greylist.start(r, reprobe_greylisted)
         while True:
             try:
-                res = await safe_blpop(r, settings.QUEUE_KEY, 5)
-                if res is None:
-                    continue
-
-                if not res:
-                    await asyncio.sleep(0.05)
-                    continue
-
-                _, raw = res
-                try:
-                    payload = json.loads(raw)
-                except Exception:
-                    LOG.exception("Invalid JSON payload popped: %s", raw)
+                job = await queue.fetch(5)
+                if job is None:
                     continue
 
                 async with AsyncSessionLocal() as db:
                     try:
-                        await process_payload(payload, db)
+                        await process_payload(job.payload, db)
                     except Exception as e:
                         LOG.exception("Unhandled error in process_payload: %s", e)
                         # requeue payload if processing failed
                         try:
-                            await r.rpush(settings.QUEUE_KEY, json.dumps(payload))
-                            LOG.info("Requeued payload after failure")
+                            await queue.retry(job)
                         except Exception as re:
                             LOG.error("Failed to requeue payload: %s", re)
+                    else:
+                        await queue.ack(job)
 
             except Exception:
                 LOG.exception("Unhandled error in worker iteration")
@@ -469,14 +848,27 @@ async def worker_loop():
         return
 
     finally:
+        try:
+            await queue.stop()
+        except Exception:
+            pass
+        await greylist.stop()
+        await progress.stop()
         try:
             await r.aclose()
         except Exception:
             pass
+        smtp_pool = getattr(ms_verifier, "smtp_pool", None)
+        if smtp_pool is not None:
+            try:
+                await smtp_pool.close_all()
+            except Exception:
+                pass
         try:
             await engine.dispose()
         except Exception:
             pass
+        _verifier_executor.shutdown(wait=False, cancel_futures=True)
         LOG.info("Worker shutdown")
 
 